@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+LOCAL_CACHE_SIZE = 1024
+LOCAL_CACHE_TTL = 5
+SHARED_CACHE_TTL = 300
+CACHE_KEY = 'auth-token:v2:{}'
+# Поля пользователя, которые попадают в кэш. Пароля и прочих
+# секретов среди них нет; остальные поля остаются отложенными
+# и при обращении читаются из базы.
+USER_CACHE_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'avatar',
+    'is_active', 'is_staff', 'is_superuser', 'deleted_at',
+)
+TOKEN_CACHE_FIELDS = ('key', 'user_id', 'created')
+
+
+class LocalTTLCache:
+    """Небольшой LRU-кэш процесса с ограниченным временем жизни."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+local_tokens = LocalTTLCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+
+def invalidate_tokens(*keys):
+    """Сбрасывает закэшированные токены во всех уровнях кэша."""
+    for key in keys:
+        local_tokens.delete(key)
+    cache.delete_many([CACHE_KEY.format(key) for key in keys])
+
+
+def _cache_entry(token):
+    """Снимок токена и пользователя для кэша: только нужные поля."""
+    return (
+        {name: getattr(token, name) for name in TOKEN_CACHE_FIELDS},
+        {name: getattr(token.user, name) if name != 'avatar'
+         else token.user.avatar.name
+         for name in USER_CACHE_FIELDS},
+    )
+
+
+def _from_values(model, values):
+    # from_db ждёт значения в порядке полей модели.
+    names = [field.attname for field in model._meta.concrete_fields
+             if field.attname in values]
+    return model.from_db(
+        DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def _from_entry(token_model, entry):
+    """Новые объекты токена и пользователя на каждый запрос.
+
+    Объекты из кэша не разделяются между запросами и потоками:
+    изменение request.user в одном запросе не видно в другом.
+    Незакэшированные поля отложены, поэтому save() пишет только
+    загруженные поля и не затирает пароль.
+    """
+    token_values, user_values = entry
+    user_model = token_model._meta.get_field('user').related_model
+    token = _from_values(token_model, token_values)
+    token.user = _from_values(user_model, user_values)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием токена и пользователя.
+
+    Сначала проверяется LRU процесса, затем общий кэш Django,
+    и только потом база. В кэше лежат только поля, нужные для
+    аутентификации. Записи сбрасываются сигналами при выходе,
+    смене пароля и деактивации пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        entry = local_tokens.get(key)
+        if entry is None:
+            entry = cache.get(CACHE_KEY.format(key))
+            if entry is None:
+                try:
+                    token = model.objects.select_related('user').get(key=key)
+                except model.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(
+                        'Недействительный токен.')
+                entry = _cache_entry(token)
+                cache.set(CACHE_KEY.format(key), entry, SHARED_CACHE_TTL)
+            local_tokens.set(key, entry)
+        token = _from_entry(model, entry)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'Пользователь неактивен или удален.')
+        return token.user, token
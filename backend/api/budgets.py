@@ -0,0 +1,56 @@
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', ('queries', 'ms'))
+
+
+class BudgetExceeded(Exception):
+    """Действие превысило объявленный бюджет запросов или времени."""
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get_budget(view_class, action):
+    """Бюджет действия из атрибута budgets вьюсета или None."""
+    return getattr(view_class, 'budgets', {}).get(action)
+
+
+def query_violations(budget, queries):
+    """Описания превышения бюджета запросов; пустой список, если его нет."""
+    if budget.queries is not None and queries > budget.queries:
+        return [f'{queries} SQL-запросов при бюджете {budget.queries}']
+    return []
+
+
+def time_violations(budget, elapsed_ms):
+    """Описания превышения бюджета времени; пустой список, если его нет."""
+    if budget.ms is not None and elapsed_ms > budget.ms:
+        return [f'{elapsed_ms:.0f} мс при бюджете {budget.ms} мс']
+    return []
+
+
+def enforce_budget(name, budget, queries, elapsed_ms):
+    """Проверяет бюджет выполненного действия.
+
+    В строгом режиме лишние запросы роняют действие. Время зависит от
+    машины и нагрузки, поэтому его превышение только пишется в лог.
+    """
+    violations = query_violations(budget, queries)
+    if violations and settings.PERFORMANCE_BUDGETS_STRICT:
+        raise BudgetExceeded(f'{name}: ' + ', '.join(violations))
+    violations += time_violations(budget, elapsed_ms)
+    if violations:
+        logger.warning(f'{name}: ' + ', '.join(violations))
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from api.compression import precompress
+from api.serializers import IngredientSerializer, TagSerializer
+from foodgram.versions import CATALOG, read_versions
+from recipes.models import Ingredient, Tag
+
+PAYLOAD_KEY = 'catalog-payload:v2:{}:{}'
+PAYLOAD_TTL = 24 * 60 * 60
+
+CATALOG_LISTS = {
+    'tags': (Tag, TagSerializer),
+    'ingredients': (Ingredient, IngredientSerializer),
+}
+
+
+def build_payload(basename, version, data):
+    """ETag, JSON-тело и его сжатые варианты для списка справочника.
+
+    ETag слабый: он один для всех кодировок тела, и 304 несёт тот же
+    тег, что и сжатый ответ 200.
+    """
+    body = JSONRenderer().render(data)
+    return f'W/"{basename}-{version}"', body, precompress(body)
+
+
+def shared_payload(basename, version, render):
+    """Готовый ответ из общего кэша или render(), сохранённый туда.
+
+    Версия в ключе: после изменения справочника старые ответы
+    просто перестают запрашиваться и истекают по TTL.
+    """
+    key = PAYLOAD_KEY.format(basename, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = render()
+        cache.set(key, payload, PAYLOAD_TTL)
+    return payload
+
+
+def warm_catalog():
+    """Готовит в общем кэше полные списки справочников."""
+    # Версия читается до данных: если справочник изменится во время
+    # подготовки, ответ ляжет под старой, уже ненужной версией.
+    version = read_versions((CATALOG,))[CATALOG]
+    for basename, (model, serializer_class) in CATALOG_LISTS.items():
+        data = serializer_class(model.objects.all(), many=True).data
+        cache.set(
+            PAYLOAD_KEY.format(basename, version),
+            build_payload(basename, version, data),
+            PAYLOAD_TTL
+        )
+    return version
@@ -0,0 +1,73 @@
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Сжимаются только данные API: в HTML админки есть CSRF-токен,
+# а сжатие страниц с секретами открывает атаку BREACH.
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain')
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения."""
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def negotiate(accept_encoding, encodings=None):
+    """Лучшая кодировка из Accept-Encoding или None.
+
+    Кодировки с q=0 отклонены клиентом; при равном q побеждает
+    та, что раньше в encodings.
+    """
+    encodings = encodings or available_encodings()
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def precompress(data):
+    """Сжатые варианты тела ответа для всех доступных кодировок.
+
+    Тела меньше порога не сжимаются — им вернётся пустой словарь.
+    """
+    if len(data) < settings.COMPRESSION_MIN_SIZE:
+        return {}
+    return {
+        encoding: compress(data, encoding)
+        for encoding in available_encodings()
+    }
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type in COMPRESSIBLE_TYPES
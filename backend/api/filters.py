@@ -1,28 +1,48 @@
 import django_filters
+from django.db.models import F
 from django_filters import rest_framework
 from django_filters.rest_framework import FilterSet
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import (RECIPE_ORDERINGS, Ingredient, Recipe,
+                            RecipeRanking, Tag, tag_mask)
+from recipes.search import search_ingredients
 
 
 class IngredientFilter(FilterSet):
 
     name = rest_framework.CharFilter(lookup_expr='istartswith')
+    search = rest_framework.CharFilter(method='fuzzy_search')
+
+    def fuzzy_search(self, queryset, name, value):
+        """Поиск с опечатками, лучшие совпадения первыми."""
+        return search_ingredients(queryset, value)
 
     class Meta:
         model = Ingredient
-        fields = ('name', )
+        fields = ('name', 'search')
 
 
 class RecipeFilter(django_filters.FilterSet):
     tags = django_filters.filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug')
+        to_field_name='slug',
+        method='any_tags_filter')
+    tags_all = django_filters.filters.ModelMultipleChoiceFilter(
+        queryset=Tag.objects.all(),
+        to_field_name='slug',
+        method='all_tags_filter')
     is_favorited = django_filters.filters.NumberFilter(
         method='is_recipe_in_favorites_filter')
     is_in_shopping_cart = django_filters.filters.NumberFilter(
         method='is_recipe_in_shoppingcart_filter')
+    ordering = django_filters.filters.ChoiceFilter(
+        choices=RecipeRanking.Kind.choices + [
+            (value, value) for value in RECIPE_ORDERINGS],
+        method='ordering_filter')
+    cooking_time_min = django_filters.filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte')
+    cooking_time_max = django_filters.filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
 
     def is_recipe_in_favorites_filter(self, queryset, name, value):
         if value == 1 and self.request.user.is_authenticated:
@@ -36,6 +56,31 @@ class RecipeFilter(django_filters.FilterSet):
             return queryset.filter(shopping_cart__user_id=user.id)
         return queryset
 
+    def any_tags_filter(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов — по маске, без JOIN."""
+        if not value:
+            return queryset
+        mask = tag_mask(tag.bit for tag in value)
+        return queryset.alias(
+            tag_bits=F('tag_mask').bitand(mask)).filter(tag_bits__gt=0)
+
+    def all_tags_filter(self, queryset, name, value):
+        """Рецепты со всеми указанными тегами."""
+        if not value:
+            return queryset
+        mask = tag_mask(tag.bit for tag in value)
+        return queryset.alias(
+            tag_bits=F('tag_mask').bitand(mask)).filter(tag_bits=mask)
+
+    def ordering_filter(self, queryset, name, value):
+        """Топы — в порядке мест, остальное — по индексируемым полям."""
+        if value in RECIPE_ORDERINGS:
+            return queryset.order_by(*RECIPE_ORDERINGS[value])
+        return queryset.filter(rankings__kind=value).order_by(
+            'rankings__rank')
+
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_all', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering', 'cooking_time_min',
+                  'cooking_time_max')
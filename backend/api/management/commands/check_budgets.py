@@ -0,0 +1,131 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import NoReverseMatch, reverse
+from rest_framework.test import APIClient
+
+from api.budgets import get_budget, query_violations, time_violations
+from api.urls import router
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import User
+
+FIXTURE_RECIPES = 12
+FIXTURE_AUTHORS = 4
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с тестовыми данными."""
+
+
+def create_fixtures():
+    """Набор данных, на котором проявляются N+1 в списках."""
+    viewer = User.objects.create(
+        username='budget_viewer', email='budget_viewer@example.org')
+    authors = [
+        User.objects.create(username=f'budget_author_{number}',
+                            email=f'budget_author_{number}@example.org')
+        for number in range(FIXTURE_AUTHORS)
+    ]
+    tags = [
+        Tag.objects.create(name=f'budget_tag_{number}',
+                           slug=f'budget_tag_{number}')
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f'budget_ingredient_{number}',
+                                  measurement_unit='г')
+        for number in range(6)
+    ]
+    recipes = []
+    for number in range(FIXTURE_RECIPES):
+        recipe = Recipe.objects.create(
+            author=authors[number % FIXTURE_AUTHORS],
+            name=f'budget_recipe_{number}', text='', cooking_time=number + 1)
+        recipe.tags.set(tags[:number % 3 + 1])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients[:number % 6 + 1]
+        )
+        recipes.append(recipe)
+    for recipe in recipes[::3]:
+        Favorite.objects.create(user=viewer, recipe=recipe)
+        ShoppingCart.objects.create(user=viewer, recipe=recipe)
+    for author in authors[:2]:
+        Follow.objects.create(user=viewer, author=author)
+    return viewer, {
+        'recipes': recipes[0].pk,
+        'users': authors[0].pk,
+        'tags': tags[0].pk,
+        'ingredients': ingredients[0].pk,
+    }
+
+
+def iter_routes():
+    """GET-маршруты роутера: (вьюсет, действие, имя url, detail)."""
+    for prefix, viewset, basename in router.registry:
+        yield prefix, viewset, 'list', f'{basename}-list', False
+        yield prefix, viewset, 'retrieve', f'{basename}-detail', True
+        for extra in viewset.get_extra_actions():
+            if 'get' in extra.mapping:
+                yield (prefix, viewset, extra.mapping['get'],
+                       f'{basename}-{extra.url_name}', extra.detail)
+
+
+class Command(BaseCommand):
+    help = 'Request every API route on generated data and check budgets'
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=['*'],
+                               PERFORMANCE_BUDGETS_STRICT=False):
+            try:
+                with transaction.atomic():
+                    violations = self.check_routes()
+                    raise Rollback
+            except Rollback:
+                pass
+        if violations:
+            raise CommandError(f'Нарушений бюджета: {violations}')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
+
+    def check_routes(self):
+        viewer, pks = create_fixtures()
+        client = APIClient()
+        client.force_authenticate(viewer)
+        violations = 0
+        for prefix, viewset, action, url_name, detail in iter_routes():
+            name = f'{viewset.__name__}.{action}'
+            budget = get_budget(viewset, action)
+            if budget is None:
+                self.stdout.write(f'{name}: бюджет не объявлен')
+                continue
+            try:
+                url = reverse(url_name, kwargs={'pk': pks[prefix]}
+                              if detail else None)
+            except NoReverseMatch:
+                continue
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    # Потоковый ответ читает базу, пока его отдают.
+                    b''.join(response.streaming_content)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            problems = query_violations(budget, len(queries))
+            if response.status_code >= 400:
+                problems.append(f'ответ {response.status_code}')
+            # Время на CI нестабильно: о нём только предупреждаем.
+            slow = time_violations(budget, elapsed_ms)
+            if problems:
+                violations += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: ' + ', '.join(problems + slow)))
+            elif slow:
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: ' + ', '.join(slow)))
+            else:
+                self.stdout.write(
+                    f'{name}: {len(queries)} запросов, {elapsed_ms:.0f} мс')
+        return violations
@@ -0,0 +1,38 @@
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import PROFILE_SUFFIX, REPORT_LIMIT, format_stats
+
+
+class Command(BaseCommand):
+    help = 'Merge sampled request profiles and print the hottest functions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--route', default='',
+            help='Только маршруты, в имени каталога которых есть строка')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=('cumulative', 'tottime', 'ncalls'),
+            help='Поле сортировки')
+        parser.add_argument(
+            '--limit', type=int, default=REPORT_LIMIT,
+            help='Сколько функций вывести')
+
+    def handle(self, *args, **options):
+        root = settings.PROFILING_DIR
+        paths = [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(root)
+            if options['route'] in os.path.relpath(directory, root)
+            for name in names
+            if name.endswith(PROFILE_SUFFIX)
+        ]
+        if not paths:
+            raise CommandError(f'В {root} нет профилей.')
+        self.stdout.write(f'Объединено профилей: {len(paths)}')
+        self.stdout.write(format_stats(
+            pstats.Stats(*paths), options['sort'], options['limit']))
@@ -0,0 +1,64 @@
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Что делает процесс при старте: только setup() или ещё и URLconf,
+# как веб-воркер при первом запросе.
+STARTUP_CODE = 'import django; django.setup()'
+URLCONF_CODE = (
+    '; from django.conf import settings'
+    '; from importlib import import_module'
+    '; import_module(settings.ROOT_URLCONF)'
+)
+IMPORTTIME_RE = re.compile(
+    r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+LIMIT = 25
+
+
+def parse_importtime(output):
+    """Суммирует собственное время импорта модулей по пакетам, мкс."""
+    packages = defaultdict(lambda: [0, 0])
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        package = packages[match.group(4).split('.')[0]]
+        package[0] += int(match.group(1))
+        package[1] += 1
+    return packages
+
+
+class Command(BaseCommand):
+    help = 'Show cold-start import time grouped by top-level package'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--urls', action='store_true',
+            help='Загрузить ещё и URLconf, как веб-воркер')
+        parser.add_argument(
+            '--limit', type=int, default=LIMIT,
+            help='Сколько пакетов вывести')
+
+    def handle(self, *args, **options):
+        code = STARTUP_CODE + (URLCONF_CODE if options['urls'] else '')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        packages = parse_importtime(result.stderr)
+        total = sum(elapsed for elapsed, _ in packages.values())
+        self.stdout.write(f'{"пакет":<30} {"мс":>9} {"доля":>6} модулей')
+        for name, (elapsed, modules) in sorted(
+            packages.items(), key=lambda item: -item[1][0]
+        )[:options['limit']]:
+            self.stdout.write(
+                f'{name:<30} {elapsed / 1000:>9.1f} '
+                f'{elapsed / total:>6.1%} {modules:>7}')
+        self.stdout.write(
+            f'Всего: {total / 1000:.1f} мс, модулей: '
+            f'{sum(modules for _, modules in packages.values())}')
@@ -0,0 +1,165 @@
+import pstats
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.permissions import SAFE_METHODS
+
+from api.budgets import QueryCounter, enforce_budget, get_budget
+from api.compression import GZIP, compress, is_compressible, negotiate
+from api.profiling import (RouteSampler, default_ring, format_stats,
+                           is_staff, run_profiled)
+
+
+def counted_stream(content, counter, on_finish):
+    """Отдаёт content, считая запросы counter; в конце вызывает on_finish.
+
+    Обёртка ставится только на время получения очередного куска: между
+    кусками соединением пользуется уже другой код.
+    """
+    content = iter(content)
+    while True:
+        with connection.execute_wrapper(counter):
+            chunk = next(content, None)
+        if chunk is None:
+            break
+        yield chunk
+    on_finish()
+
+
+class BudgetMiddleware:
+    """Проверяет бюджеты запросов и времени, объявленные во вьюсетах.
+
+    Потоковый ответ читает базу, пока его отдают, уже после выхода из
+    вьюхи. Его запросы тоже считаются, а бюджет проверяется, когда
+    поток закончился.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        budget = getattr(request, '_budget', None)
+        if budget is None:
+            return response
+
+        def enforce():
+            enforce_budget(
+                request._budget_name, budget, counter.count,
+                (time.perf_counter() - started) * 1000
+            )
+
+        if response.streaming:
+            response.streaming_content = counted_stream(
+                response.streaming_content, counter, enforce)
+        else:
+            enforce()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None)
+        if view_class is None or not actions:
+            return None
+        action = actions.get(request.method.lower())
+        budget = get_budget(view_class, action)
+        if budget is not None:
+            request._budget = budget
+            request._budget_name = f'{view_class.__name__}.{action}'
+        return None
+
+
+class ProfilingMiddleware:
+    """Профилирование запросов к API.
+
+    Сотрудник может добавить ?_profile=1 и получить вместо ответа
+    сводку cProfile — только для безопасных методов: изменяющий запрос
+    выполнился бы, хотя клиент получил бы сводку вместо ответа. Кроме
+    того, каждый PROFILING_SAMPLE_RATE-й запрос к маршруту любым методом
+    профилируется, а сводки пишутся на диск; клиент получает обычный
+    ответ.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = RouteSampler(settings.PROFILING_SAMPLE_RATE)
+        self.ring = default_ring()
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not request.path.startswith('/api/'):
+            return None
+        if (request.GET.get('_profile') == '1'
+                and request.method in SAFE_METHODS and is_staff(request)):
+            _, profiler = run_profiled(
+                view_func, request, view_args, view_kwargs)
+            return HttpResponse(
+                format_stats(pstats.Stats(profiler)),
+                content_type='text/plain; charset=utf-8'
+            )
+        route = request.resolver_match.route
+        if self.sampler.should_sample(route):
+            response, profiler = run_profiled(
+                view_func, request, view_args, view_kwargs)
+            self.ring.add(route, profiler)
+            return response
+        return None
+
+
+class CompressionMiddleware:
+    """Сжимает ответы API по Accept-Encoding: brotli, если есть, и gzip.
+
+    Готовые сжатые варианты (response.precompressed) отдаются как есть,
+    остальные ответы сжимаются на лету, если не меньше
+    COMPRESSION_MIN_SIZE. Потоковые ответы сжимаются только gzip.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.has_header('Content-Encoding')
+                or not is_compressible(response)):
+            return response
+        if not response.streaming and len(response.content) < (
+                settings.COMPRESSION_MIN_SIZE):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if response.streaming:
+            encoding = negotiate(accept, (GZIP,))
+            if encoding is None:
+                return response
+            response.streaming_content = compress_sequence(
+                response.streaming_content)
+            del response['Content-Length']
+        else:
+            encoding = negotiate(accept)
+            if encoding is None:
+                return response
+            variants = getattr(response, 'precompressed', {})
+            content = variants.get(encoding)
+            if content is None:
+                content = compress(response.content, encoding)
+                if len(content) >= len(response.content):
+                    return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # Сжатое тело побайтно отличается от исходного.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = encoding
+        return response
@@ -1,7 +1,32 @@
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from foodgram.paginator import EstimatedCountPaginator
 
 
 class RecipePagination(PageNumberPagination):
-    """Кастомная пагинация для рецептов."""
+    """Кастомная пагинация для рецептов.
+
+    На больших выборках count берётся из статистики планировщика,
+    о чём сообщает флаг count_is_approximate.
+    """
     page_size = 6  # Количество рецептов на одной странице
     page_size_query_param = 'limit'
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_approximate': not self.page.paginator.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_approximate'] = {
+            'type': 'boolean',
+            'example': False,
+        }
+        return response_schema
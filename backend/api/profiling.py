@@ -0,0 +1,131 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+from collections import defaultdict
+from threading import Lock
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+
+REPORT_LIMIT = 50
+PROFILE_SUFFIX = '.prof'
+
+
+def route_slug(route):
+    """Имя каталога для маршрута."""
+    return re.sub(r'[^\w.-]+', '_', route).strip('_') or 'root'
+
+
+def is_staff(request):
+    """Сотрудник ли автор запроса — по сессии или по токену."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def run_profiled(view_func, request, args, kwargs):
+    """Выполняет вьюху и отрисовку ответа под cProfile."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = view_func(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+    finally:
+        profiler.disable()
+    return response, profiler
+
+
+def format_stats(stats, sort='cumulative', limit=REPORT_LIMIT):
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfileRing:
+    """Копит профили выборочных запросов и сбрасывает их на диск.
+
+    Для каждого маршрута хранится не больше size файлов на все
+    процессы: после записи самые старые файлы удаляются, поэтому
+    перезапуски воркеров с новыми pid не копят сводки.
+    """
+
+    def __init__(self, directory, size, flush_every):
+        self.directory = directory
+        self.size = size
+        self.flush_every = flush_every
+        self.stats = {}
+        self.samples = defaultdict(int)
+        self.flushes = defaultdict(int)
+        self.lock = Lock()
+
+    def add(self, route, profiler):
+        with self.lock:
+            if route in self.stats:
+                self.stats[route].add(profiler)
+            else:
+                self.stats[route] = pstats.Stats(profiler)
+            self.samples[route] += 1
+            if self.samples[route] >= self.flush_every:
+                self.flush(route)
+
+    def flush(self, route):
+        directory = os.path.join(self.directory, route_slug(route))
+        os.makedirs(directory, exist_ok=True)
+        slot = self.flushes[route] % self.size
+        self.stats.pop(route).dump_stats(os.path.join(
+            directory, f'{os.getpid()}-{slot}{PROFILE_SUFFIX}'))
+        self.samples[route] = 0
+        self.flushes[route] += 1
+        self.prune(directory)
+
+    def prune(self, directory):
+        """Оставляет в каталоге маршрута size самых свежих сводок."""
+        paths = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(PROFILE_SUFFIX):
+                try:
+                    paths.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        paths.sort(reverse=True)
+        for _, path in paths[self.size:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Файл уже удалил другой процесс.
+                pass
+
+
+class RouteSampler:
+    """Решает, профилировать ли запрос: каждый N-й на маршрут."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.counters = defaultdict(int)
+        self.lock = Lock()
+
+    def should_sample(self, route):
+        if not self.rate:
+            return False
+        with self.lock:
+            self.counters[route] += 1
+            return self.counters[route] % self.rate == 0
+
+
+def default_ring():
+    return ProfileRing(
+        settings.PROFILING_DIR,
+        settings.PROFILING_RING_SIZE,
+        settings.PROFILING_FLUSH_EVERY,
+    )
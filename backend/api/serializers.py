@@ -2,11 +2,18 @@ import base64
 import uuid
 
 from django.core.files.base import ContentFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
+from api.sparse import SparseFieldsMixin
 from api.validators import validate_username, validate_new_password
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from jobs.queue import enqueue_on_commit
+from jobs.tasks import delete_media_file
+from recipes.models import (MAX_SERVINGS, Follow, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from recipes.rankings import change_ingredient_usage
+from recipes.tasks import update_similar_recipes
 from users.models import User
 
 
@@ -14,6 +21,20 @@ MINIMUM = 1
 MAXIMUM = 32_000
 
 
+def get_followed_author_ids(request):
+    """Id авторов, на которых подписан текущий пользователь.
+
+    Загружается одним запросом и запоминается на объекте запроса,
+    чтобы все сериализаторы пользователей в ответе делили один набор.
+    """
+    if not hasattr(request, '_followed_author_ids'):
+        request._followed_author_ids = set(
+            Follow.objects.filter(user=request.user).values_list(
+                'author_id', flat=True)
+        )
+    return request._followed_author_ids
+
+
 class Base64ImageField(serializers.ImageField):
     """Кастомное поле для обработки изображений в формате base64."""
 
@@ -39,7 +60,7 @@ class UserCustomCreateSerializer(UserCreateSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
 
-class UserReadSerializer(UserSerializer):
+class UserReadSerializer(SparseFieldsMixin, UserSerializer):
     """Сериализатор для показа пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -54,7 +75,7 @@ class UserReadSerializer(UserSerializer):
 
         request = self.context.get('request')
         if request and not request.user.is_anonymous:
-            return request.user.following.filter(author=obj).exists()
+            return obj.id in get_followed_author_ids(request)
         return False
 
 
@@ -73,8 +94,8 @@ class AvatarSerializer(serializers.ModelSerializer):
         """Обновляет аватар пользователя."""
         avatar_data = validated_data.get('avatar', None)
         if avatar_data:
-            filename = f'user_{instance.id}_avatar.png'
-            instance.avatar.save(filename, avatar_data, save=True)
+            # Имя задаст хранилище по содержимому файла.
+            instance.avatar.save(avatar_data.name, avatar_data, save=True)
         return instance
 
     class Meta:
@@ -142,11 +163,11 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор рецепта."""
 
     tags = TagSerializer(many=True)
-    author = UserSerializer()
+    author = UserReadSerializer()
     ingredients = IngredientInRecipeSerializer(
         source='ingredient_list', many=True)
     is_favorited = serializers.SerializerMethodField()
@@ -156,19 +177,23 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time'
+                  'image', 'text', 'cooking_time', 'servings'
                   )
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return obj.favorites.filter(user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return obj.shopping_cart.filter(user=request.user).exists()
 
 
@@ -193,6 +218,15 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class ShoppingCartServingsSerializer(serializers.Serializer):
+    """Сколько порций рецепта приготовить по списку покупок."""
+
+    servings = serializers.IntegerField(
+        min_value=MINIMUM, max_value=MAX_SERVINGS,
+        required=False, allow_null=True
+    )
+
+
 class CreateRecipeSerializer(serializers.ModelSerializer):
     """Для создания рецептов"""
 
@@ -204,11 +238,14 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     cooking_time = serializers.IntegerField(
         min_value=MINIMUM, max_value=MAXIMUM
     )
+    servings = serializers.IntegerField(
+        min_value=MINIMUM, max_value=MAX_SERVINGS, required=False
+    )
 
     class Meta:
         model = Recipe
         fields = ('ingredients', 'tags', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'text', 'cooking_time', 'servings')
 
     def to_representation(self, instance):
         serializer = RecipeSerializer(
@@ -238,10 +275,13 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             for element in ingredients
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        change_ingredient_usage(
+            [element['id'] for element in ingredients], 1)
 
     def create_tags(self, tags, recipe):
         recipe.tags.set(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -250,19 +290,29 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data, author=user)
         self.create_ingredients(ingredients, recipe)
         self.create_tags(tags, recipe)
+        enqueue_on_commit(update_similar_recipes, recipe_id=recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', [])
         tags = validated_data.pop('tags', [])
 
         if ingredients:
-            RecipeIngredient.objects.filter(recipe=instance).delete()
+            previous = RecipeIngredient.objects.filter(recipe=instance)
+            change_ingredient_usage(
+                list(previous.values_list('ingredient_id', flat=True)), -1)
+            previous.delete()
             self.create_ingredients(ingredients, instance)
+            enqueue_on_commit(update_similar_recipes, recipe_id=instance.id)
 
         if tags:
             instance.tags.set(tags)
 
+        old_image = instance.image.name
+        if 'image' in validated_data and old_image:
+            enqueue_on_commit(delete_media_file, name=old_image)
+
         return super().update(instance, validated_data)
 
 
@@ -311,4 +361,6 @@ class FollowSerializer(UserReadSerializer):
 
     @staticmethod
     def get_recipes_count(obj):
+        if hasattr(obj, 'recipes_total'):
+            return obj.recipes_total
         return obj.recipes.count()
@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast, Coalesce
+
+from recipes.models import RecipeIngredient
+
+MASS = 'mass'
+VOLUME = 'volume'
+PIECES = 'pieces'
+
+# Единица измерения -> (величина, множитель к базовой единице величины).
+UNIT_CONVERSIONS = {
+    'мг': (MASS, 0.001),
+    'г': (MASS, 1),
+    'кг': (MASS, 1000),
+    'мл': (VOLUME, 1),
+    'л': (VOLUME, 1000),
+    'капля': (VOLUME, 0.05),
+    'ч. л.': (VOLUME, 5),
+    'ст. л.': (VOLUME, 15),
+    'стакан': (VOLUME, 250),
+    'шт.': (PIECES, 1),
+}
+
+ROUNDING_DIGITS = 6
+DISPLAY_DIGITS = 2
+
+# Единицы для вывода: от крупной к мелкой,
+# (порог, название, знаков после запятой).
+DISPLAY_UNITS = {
+    MASS: ((1000, 'кг', 2), (1, 'г', 2), (0.001, 'мг', 0)),
+    VOLUME: ((1000, 'л', 2), (1, 'мл', 2)),
+    PIECES: ((1, 'шт.', 0),),
+}
+
+
+def normalize_unit(unit):
+    """Возвращает величину и множитель к базовой единице.
+
+    Неизвестные единицы считаются отдельной величиной с множителем 1.
+    """
+    unit = ' '.join(unit.split()).lower()
+    return UNIT_CONVERSIONS.get(unit, (unit, 1))
+
+
+def humanize_amount(total, dimension):
+    """Переводит количество в базовых единицах в удобную единицу.
+
+    Купить нужно не меньше, чем требуется, поэтому количество
+    округляется вверх до точности выбранной единицы: штуки — до целых,
+    граммы и миллилитры — до сотых.
+    """
+    units = DISPLAY_UNITS.get(dimension, ((1, dimension, DISPLAY_DIGITS),))
+    threshold, unit, digits = next(
+        (item for item in units if total >= item[0]), units[-1])
+    scale = 10 ** digits
+    # Погрешность деления на порции не должна добавлять лишнюю сотую.
+    amount = math.ceil(round(total / threshold * scale, ROUNDING_DIGITS))
+    return amount / scale, unit
+
+
+def format_amount(value):
+    """Округляет количество до сотых и убирает лишние нули."""
+    return f'{value:.{DISPLAY_DIGITS}f}'.rstrip('0').rstrip('.')
+
+
+def aggregate_ingredients(rows):
+    """Суммирует ингредиенты с приведением единиц измерения.
+
+    rows — последовательность (id, название, единица, количество).
+    Один и тот же продукт в разных единицах одной величины
+    («мука, г» и «мука, кг») сворачивается в одну строку.
+    Возвращает список (название, количество, единица) по алфавиту.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    amounts = np.fromiter(
+        (row[3] for row in rows), dtype=np.float64, count=len(rows))
+    factors = np.empty(len(rows), dtype=np.float64)
+    group_index = np.empty(len(rows), dtype=np.intp)
+    groups = {}
+    for position, (_, name, unit, _) in enumerate(rows):
+        dimension, factor = normalize_unit(unit)
+        key = (name.strip().lower(), dimension)
+        if key not in groups:
+            groups[key] = (len(groups), name.strip())
+        group_index[position] = groups[key][0]
+        factors[position] = factor
+
+    totals = np.bincount(
+        group_index, weights=amounts * factors, minlength=len(groups))
+
+    result = []
+    for (_, dimension), (index, name) in groups.items():
+        amount, unit = humanize_amount(totals[index], dimension)
+        result.append((name, format_amount(amount), unit))
+    return sorted(result, key=lambda item: (item[0].lower(), item[2]))
+
+
+def get_shopping_list(user):
+    """Собирает список покупок пользователя.
+
+    База одним запросом суммирует количества по каждому ингредиенту
+    каталога, пересчитанные на нужное число порций, а приведение
+    единиц выполняется одним проходом в NumPy.
+    """
+    rows = RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user,
+        recipe__deleted_at__isnull=True,
+    ).values_list(
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).annotate(total=Sum(
+        Cast('amount', FloatField())
+        * Coalesce('recipe__shopping_cart__servings', 'recipe__servings')
+        / F('recipe__servings'),
+        output_field=FloatField()
+    )).order_by()
+    return aggregate_ingredients(rows)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.tasks import warm_catalog_cache
+from foodgram.versions import bump, user_namespace
+from jobs.queue import enqueue_once_on_commit
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Выход из системы удаляет токен — убираем его из кэша."""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Смена пароля или деактивация должны сразу сбросить кэш."""
+    if created:
+        return
+    bump(user_namespace(instance.pk))
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True))
+    if keys:
+        invalidate_tokens(*keys)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Воркер заранее готовит новые ответы справочников.
+
+    Загрузка справочника меняет тысячи строк, а прогрев пересобирает
+    его целиком, поэтому задача ставится одна на транзакцию.
+    """
+    enqueue_once_on_commit(warm_catalog_cache)
@@ -0,0 +1,58 @@
+from django.utils.functional import cached_property
+from rest_framework.serializers import ValidationError
+
+FIELDS_PARAM = 'fields'
+SPARSE_ACTIONS = ('list', 'retrieve', 'me')
+
+
+def requested_fields(request, allowed):
+    """Поля из ?fields=id,name или None, если параметр не передан."""
+    value = request.query_params.get(FIELDS_PARAM)
+    if value is None:
+        return None
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = set(fields) - set(allowed)
+    if not fields or unknown:
+        raise ValidationError({FIELDS_PARAM: (
+            f'Неизвестные поля: {", ".join(sorted(unknown))}.' if unknown
+            else 'Не указано ни одного поля.'
+        )})
+    return fields
+
+
+class SparseFieldsMixin:
+    """Сериализатор, который отдаёт только поля из аргумента fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """Вьюсет, который поддерживает ?fields= в списке и карточке.
+
+    Запрошенные поля доступны в sparse_fields, чтобы get_queryset мог
+    не загружать лишние колонки и связи.
+    """
+
+    sparse_serializer_class = None
+
+    @cached_property
+    def sparse_fields(self):
+        if self.action not in SPARSE_ACTIONS:
+            return None
+        return requested_fields(
+            self.request, self.sparse_serializer_class.Meta.fields)
+
+    def wants(self, *names):
+        """Нужно ли в ответе хотя бы одно из полей."""
+        return self.sparse_fields is None or any(
+            name in self.sparse_fields for name in names)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs.setdefault('fields', self.sparse_fields)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,77 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+
+from recipes.models import Recipe, RecipeTombstone
+
+# Запас по времени на транзакции, зафиксированные позже, чем начались.
+SYNC_OVERLAP = timedelta(seconds=5)
+CHUNK_SIZE = 2000
+
+
+def conditional_response(request, data):
+    """Ответ со слабым ETag; 304, если у клиента те же данные.
+
+    ETag считается по данным, а не по байтам тела, поэтому он слабый
+    и одинаков у сжатого и несжатого ответа и у 304. Он учитывает и
+    пользовательские флаги вроде is_favorited. Last-Modified не
+    отдаётся: флаги читателя и профиль автора меняются без правки
+    рецепта, и клиент с одним If-Modified-Since получил бы 304
+    на устаревшие данные.
+    """
+    etag = 'W/' + quote_etag(
+        hashlib.md5(JSONRenderer().render(data)).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(data)
+    response['ETag'] = etag
+    return response
+
+
+def encode_sync_token(moment):
+    """Токен синхронизации — момент времени в микросекундах."""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_sync_token(token):
+    try:
+        return datetime.fromtimestamp(
+            int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValidationError({'since': 'Некорректный токен синхронизации.'})
+
+
+def _stream_ids(queryset):
+    first = True
+    for pk in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield str(pk) if first else f',{pk}'
+        first = False
+
+
+def stream_changes(since):
+    """Потоково отдаёт id изменённых и удалённых с момента since рецептов.
+
+    Без since клиент получает полный список id рецептов.
+    """
+    now = timezone.now()
+    upserted = Recipe.objects.order_by().values_list('id', flat=True)
+    deleted = RecipeTombstone.objects.none()
+    if since is not None:
+        since -= SYNC_OVERLAP
+        upserted = upserted.filter(updated__gte=since)
+        deleted = RecipeTombstone.objects.filter(
+            deleted__gte=since).order_by().values_list('recipe_id', flat=True)
+
+    yield json.dumps({'next': encode_sync_token(now)})[:-1]
+    yield ', "upserted": ['
+    yield from _stream_ids(upserted)
+    yield '], "deleted": ['
+    yield from _stream_ids(deleted)
+    yield ']}'
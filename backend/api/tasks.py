@@ -0,0 +1,9 @@
+from jobs.queue import task
+
+
+@task()
+def warm_catalog_cache():
+    """Готовит ответы справочников, чтобы их не собирал запрос."""
+    # Импорт здесь: модуль задач грузится при старте любого процесса.
+    from api.catalog import warm_catalog
+    warm_catalog()
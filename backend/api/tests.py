@@ -0,0 +1,71 @@
+from threading import Barrier, Thread
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Follow, Recipe, ShoppingCart
+from users.models import User
+
+CONCURRENT_REQUESTS = 8
+
+
+# SQLite блокирует всю базу на запись, и параллельные запросы падают
+# с «database table is locked» вместо того, чтобы состязаться.
+@skipUnless(connection.vendor == 'postgresql', 'нужен PostgreSQL')
+class ConcurrentLinkTests(TransactionTestCase):
+    """Одновременные POST создают связь ровно один раз."""
+
+    def setUp(self):
+        self.author = User.objects.create(
+            username='author', email='author@example.org')
+        self.user = User.objects.create(
+            username='user', email='user@example.org')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='', cooking_time=1)
+
+    def post_concurrently(self, url):
+        """Статусы ответов на одновременные POST одного пользователя."""
+        barrier = Barrier(CONCURRENT_REQUESTS)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=post) for _ in range(CONCURRENT_REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_created_once(self, statuses):
+        self.assertEqual(
+            statuses, [201] + [400] * (CONCURRENT_REQUESTS - 1))
+
+    def test_favorite(self):
+        self.assert_created_once(self.post_concurrently(
+            f'/api/recipes/{self.recipe.pk}/favorite/'))
+        self.assertEqual(Favorite.objects.filter(
+            user=self.user, recipe=self.recipe).count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_shopping_cart(self):
+        self.assert_created_once(self.post_concurrently(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/'))
+        self.assertEqual(ShoppingCart.objects.filter(
+            user=self.user, recipe=self.recipe).count(), 1)
+
+    def test_subscribe(self):
+        self.assert_created_once(self.post_concurrently(
+            f'/api/users/{self.author.pk}/subscribe/'))
+        self.assertEqual(Follow.objects.filter(
+            user=self.user, author=self.author).count(), 1)
@@ -18,6 +18,7 @@ urlpatterns = [
         views.short_link_redirect,
         name='short_link_redirect'
     ),
+    path('internal/events/', views.events_feed, name='events_feed'),
     path(
         'recipes/<int:pk>/',
         views.RecipeViewSet.as_view({'get': 'retrieve'}),
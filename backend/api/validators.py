@@ -2,6 +2,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
 from rest_framework import serializers
 
+from users.models import DELETED_PLACEHOLDER
+
 INVALID_USERNAMES = {'me', 'monkey', 'idiot', 'bitch'}
 
 
@@ -11,6 +13,10 @@ def validate_username(value):
         raise serializers.ValidationError(
             'Данное имя пользователя в списке запрещенных имен!'
         )
+    if value.startswith(DELETED_PLACEHOLDER.format('')):
+        raise serializers.ValidationError(
+            'Имя пользователя не может начинаться с «deleted:».'
+        )
     return value
 
 
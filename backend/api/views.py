@@ -1,48 +1,101 @@
-from django.db.models import Prefetch, Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q
+from django.db.models.functions import Greatest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
 
-from hashids import Hashids
+from events.models import Event
+from events.outbox import (FAVORITE, FOLLOW, SHOPPING_CART, STREAM_LIMIT,
+                           decode_position, record_event, stream_events)
 from foodgram import settings
+from foodgram.versions import (CATALOG, VersionedCache, bump,
+                               recipe_namespace, user_namespace)
+
+from jobs.queue import enqueue_on_commit
+from jobs.tasks import delete_media_file
 
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            ShoppingCart, Tag)
+from recipes.purge import soft_delete_recipes
+from recipes.rankings import record_activity
+from recipes.relations import link_once
+from recipes.search import SEARCH_LIMIT
 from rest_framework import mixins, status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
 from rest_framework.viewsets import ModelViewSet
 from users.models import User
 
+from .budgets import Budget
+from .catalog import build_payload, shared_payload
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import RecipePagination
 from .premissions import IsAuthorOrReadOnly
+from .shopping_list import get_shopping_list
+from .sparse import SparseFieldsViewMixin
+from .sync import conditional_response, decode_sync_token, stream_changes
 from .serializers import (AddFavoritesSerializer, AvatarSerializer,
                           ChangePasswordSerializer, CreateRecipeSerializer,
                           FollowSerializer, IngredientSerializer,
-                          RecipeSerializer, TagSerializer,
+                          RecipeSerializer, ShoppingCartServingsSerializer,
+                          ShortRecipeSerializer, TagSerializer,
                           UserCustomCreateSerializer, UserReadSerializer)
 
+EVENT_TOPICS = {
+    Favorite: FAVORITE,
+    ShoppingCart: SHOPPING_CART,
+}
+
+# Готовые ответы справочников и рецептов; сбрасываются по версиям
+# пространств имён, которые меняют записи в любом процессе.
+local_cache = VersionedCache()
+
 
-class UserViewSet(mixins.CreateModelMixin,
+class UserViewSet(SparseFieldsViewMixin,
+                  mixins.CreateModelMixin,
                   mixins.ListModelMixin,
                   mixins.RetrieveModelMixin,
                   viewsets.GenericViewSet):
     queryset = User.objects.all()
+    # Нечисловой id отсекается маршрутом: до ORM он не доходит.
+    lookup_value_regex = r'\d+'
+    sparse_serializer_class = UserReadSerializer
     permission_classes = (AllowAny,)
     pagination_class = RecipePagination
+    budgets = {
+        'list': Budget(queries=4, ms=200),
+        'retrieve': Budget(queries=3, ms=100),
+        'me': Budget(queries=2, ms=100),
+        'subscriptions': Budget(queries=5, ms=200),
+    }
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return UserReadSerializer
         return UserCustomCreateSerializer
 
+    def get_queryset(self):
+        """С ?fields= читаются только колонки запрошенных полей."""
+        queryset = super().get_queryset()
+        if self.sparse_fields is not None:
+            queryset = queryset.only('id', *(
+                name for name in self.sparse_fields
+                if name != 'is_subscribed'))
+        return queryset
+
     @action(detail=False, methods=['get'],
             pagination_class=None,
             permission_classes=(IsAuthenticated,))
     def me(self, request):
-        serializer = UserReadSerializer(request.user)
+        serializer = UserReadSerializer(
+            request.user, fields=self.sparse_fields)
         return Response(serializer.data,
                         status=status.HTTP_200_OK)
 
@@ -66,7 +119,21 @@ class UserViewSet(mixins.CreateModelMixin,
         url_name='subscriptions',
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=self.request.user)
+        """Авторы из подписок с их последними рецептами.
+
+        Рецепты всех авторов страницы загружаются одним запросом,
+        а recipes_limit применяется к уже загруженному списку.
+        """
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author_id')
+        queryset = User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            recipes_total=Count(
+                'recipes', filter=Q(recipes__deleted_at__isnull=True))
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('username')
         pages = self.paginate_queryset(queryset)
 
         if pages:
@@ -87,35 +154,40 @@ class UserViewSet(mixins.CreateModelMixin,
         url_path='subscribe',
         url_name='subscribe',
     )
+    @transaction.atomic
     def subscribe(self, request, pk):
         user = request.user
-        author = get_object_or_404(User, id=pk)
 
-        if user == author:
+        if str(user.id) == str(pk):
             return Response(
                 {'detail': 'На себя нельзя.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        subscription = user.followers.filter(author=author)
-
         if request.method == 'POST':
-            if subscription.exists():
+            created = link_once(Follow, 'author', pk, user=user)
+            author = get_object_or_404(User, id=pk)
+            if not created:
                 return Response(
                     {'detail': 'Уже подписаны.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Follow.objects.create(user=user, author=author)
+            record_event(FOLLOW, Event.Action.CREATED, author.id, user=user.id)
+            bump(user_namespace(user.id))
             serializer = FollowSerializer(author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            if subscription.exists():
-                subscription.delete()
+            deleted, _ = user.followers.filter(author_id=pk).delete()
+            if deleted:
+                record_event(FOLLOW, Event.Action.DELETED, int(pk),
+                             user=user.id)
+                bump(user_namespace(user.id))
                 return Response(
                     {'detail': 'Вы отписались.'},
                     status=status.HTTP_204_NO_CONTENT
                 )
+            get_object_or_404(User, id=pk)
             return Response(
                 {'detail': 'Вы не подписаны.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -127,14 +199,16 @@ class UserViewSet(mixins.CreateModelMixin,
         permission_classes=[IsAuthenticated],
         url_path='me/avatar'
     )
+    @transaction.atomic
     def avatar(self, request, *args, **kwargs):
         user = self.request.user
-        if user.avatar:
-            user.avatar.delete()
+        old_avatar = user.avatar.name
 
         serializer = AvatarSerializer(instance=user, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        if old_avatar and old_avatar != user.avatar.name:
+            enqueue_on_commit(delete_media_file, name=old_avatar)
 
         return Response({'avatar': user.avatar.url}, status=status.HTTP_200_OK)
 
@@ -144,7 +218,7 @@ class UserViewSet(mixins.CreateModelMixin,
         user = request.user
 
         if user.avatar:
-            user.avatar.delete(save=False)
+            enqueue_on_commit(delete_media_file, name=user.avatar.name)
             user.avatar = None
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -155,15 +229,58 @@ class UserViewSet(mixins.CreateModelMixin,
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogCacheMixin:
+    """Список справочника из локального кэша процесса.
+
+    В кэше лежит готовое JSON-тело вместе со сжатыми вариантами, так что
+    повторный запрос не тратит время ни на сериализацию, ни на сжатие.
+    ETag — версия пространства catalog, которое сбрасывается при
+    изменении тегов и ингредиентов в любом процессе.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        etag, body, variants = local_cache.get_or_set(
+            (self.basename, request.GET.urlencode()), (CATALOG,),
+            lambda: self._build_payload(request, *args, **kwargs)
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+            response.precompressed = variants
+        response['ETag'] = etag
+        return response
+
+    def _build_payload(self, request, *args, **kwargs):
+        """Полный список берётся из общего кэша, который греет воркер."""
+        version, = local_cache.current((CATALOG,))
+
+        def render():
+            return build_payload(
+                self.basename, version,
+                super(CatalogCacheMixin, self).list(
+                    request, *args, **kwargs).data
+            )
+
+        if request.GET:
+            return render()
+        return shared_payload(self.basename, version, render)
+
+
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
+    budgets = {
+        'list': Budget(queries=2, ms=100),
+        'retrieve': Budget(queries=2, ms=100),
+    }
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -171,17 +288,41 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    budgets = {
+        'list': Budget(queries=3, ms=200),
+        'retrieve': Budget(queries=2, ms=100),
+    }
     search_fields = ('^name',)
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Поиск ранжирует все совпадения; список отдаёт только лучшие,
+        # а объект ищется по полному queryset.
+        if self.action == 'list' and self.request.query_params.get('search'):
+            return queryset[:SEARCH_LIMIT]
+        return queryset
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(SparseFieldsViewMixin, ModelViewSet):
     """Вьюшка для рецептов"""
 
     queryset = Recipe.objects.prefetch_related('ingredient_list').all()
+    lookup_value_regex = r'\d+'
     pagination_class = RecipePagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    sparse_serializer_class = RecipeSerializer
+    budgets = {
+        'list': Budget(queries=7, ms=300),
+        'retrieve': Budget(queries=7, ms=200),
+        'download_shopping_cart': Budget(queries=2, ms=300),
+        'get_link': Budget(queries=5, ms=100),
+        'similar': Budget(queries=6, ms=200),
+        # Изменённые и удалённые рецепты — по запросу на каждый список;
+        # запросы потока считает BudgetMiddleware.
+        'changes': Budget(queries=2, ms=500),
+    }
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -195,41 +336,144 @@ class RecipeViewSet(ModelViewSet):
         return context
 
     def get_queryset(self):
-        """Оптимизация запросов с предзагрузкой избранного и корзины."""
+        """Оптимизация запросов: флаги избранного и корзины — подзапросами.
+
+        С ?fields= связи, подзапросы и текст рецепта, которых нет
+        в ответе, не загружаются.
+        """
         user = self.request.user
         queryset = Recipe.objects.all()
-        if user.is_authenticated:
+        if self.wants('author'):
+            queryset = queryset.select_related('author')
+        if self.wants('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if self.wants('ingredients'):
             queryset = queryset.prefetch_related(
-                Prefetch(
-                    'favorites',
-                    queryset=user.favorites.all(),
-                ),
-                Prefetch(
-                    'shopping_cart',
-                    queryset=user.shopping_cart.all()
-                )
-            )
+                'ingredient_list__ingredient')
+        if not self.wants('text'):
+            queryset = queryset.defer('text')
+        if user.is_authenticated:
+            if self.wants('is_favorited'):
+                queryset = queryset.annotate(is_favorited=Exists(
+                    Favorite.objects.filter(
+                        user=user, recipe=OuterRef('pk'))))
+            if self.wants('is_in_shopping_cart'):
+                queryset = queryset.annotate(is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=OuterRef('pk'))))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        return conditional_response(request, response.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из локального кэша, если он и его автор не менялись.
+
+        Флаги is_favorited и is_subscribed зависят от читателя, поэтому
+        запись привязана и к его пространству имён. Версии всех
+        пространств читаются до данных: иначе изменение, случившееся
+        во время сериализации, закэшировалось бы под новой версией.
+        """
+        user = request.user
+        viewer = user.id if user.is_authenticated else None
+        key = ('recipe', kwargs['pk'], viewer, request.GET.urlencode())
+        cached = local_cache.get(key)
+        if cached is None:
+            author_id = get_object_or_404(
+                Recipe.objects.values_list('author_id', flat=True),
+                pk=kwargs['pk'])
+            namespaces = (CATALOG, recipe_namespace(kwargs['pk']),
+                          user_namespace(author_id))
+            if viewer is not None:
+                namespaces += (user_namespace(viewer),)
+            versions = local_cache.current(namespaces)
+            instance = self.get_object()
+            cached = self.get_serializer(instance).data
+            # Автора сменили между запросами — версия его пространства
+            # прочитана не для того пользователя.
+            if instance.author_id == author_id:
+                local_cache.set(key, namespaces, cached, versions)
+        return conditional_response(request, cached)
+
+    def perform_destroy(self, instance):
+        soft_delete_recipes([instance.pk])
 
-    def _handle_action(self, request, model, serializer_class, error_msg, pk):
-        """Общий метод для добавления/удаления объектов."""
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(AllowAny,),
+        pagination_class=None,
+    )
+    def changes(self, request):
+        """Id рецептов, изменённых и удалённых с момента since."""
+        since = request.query_params.get('since')
+        if since is not None:
+            since = decode_sync_token(since)
+        return StreamingHttpResponse(
+            stream_changes(since), content_type='application/json')
+
+    @action(
+        detail=True,
+        methods=('get',),
+        permission_classes=(AllowAny,),
+        pagination_class=None,
+    )
+    def similar(self, request, pk):
+        """Рецепты с самым похожим набором ингредиентов."""
+        recipe = self.get_object()
+        recipes = Recipe.objects.filter(
+            neighbour_of__recipe=recipe
+        ).order_by('-neighbour_of__score')
+        serializer = ShortRecipeSerializer(
+            recipes, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @transaction.atomic
+    def _handle_action(self, request, model, serializer_class, error_msg, pk,
+                       extra=None, counter=None):
+        """Общий метод для добавления/удаления объектов.
+
+        Добавление и удаление — по одному запросу, без предварительной
+        проверки exists(): повторный клик не приводит к IntegrityError.
+        counter — поле-счётчик рецепта, которое меняется вместе со связью.
+        Событие для outbox пишется в той же транзакции.
+        """
         user = request.user
-        recipe = get_object_or_404(Recipe, id=pk)
+        topic = EVENT_TOPICS[model]
 
         if request.method == 'POST':
-            if model.objects.filter(user=user, recipe=recipe).exists():
+            created = link_once(
+                model, 'recipe', pk, user=user, **(extra or {}))
+            recipe = get_object_or_404(Recipe, id=pk)
+            if not created:
                 return Response(
                     {'errors': error_msg.format(recipe.name)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            model.objects.create(user=user, recipe=recipe)
+            record_activity(recipe.id, model, 1)
+            if counter:
+                Recipe.all_objects.filter(pk=pk).update(
+                    **{counter: F(counter) + 1})
+            record_event(topic, Event.Action.CREATED, recipe.id,
+                         user=user.id, **(extra or {}))
+            bump(recipe_namespace(recipe.id), user_namespace(user.id))
             serializer = serializer_class(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            obj = model.objects.filter(user=user, recipe=recipe)
-            if obj.exists():
-                obj.delete()
+            deleted, _ = model.objects.filter(
+                user=user, recipe_id=pk).delete()
+            if deleted:
+                record_activity(pk, model, -1)
+                if counter:
+                    Recipe.all_objects.filter(pk=pk).update(
+                        **{counter: Greatest(F(counter) - 1, 0)})
+                record_event(topic, Event.Action.DELETED, int(pk),
+                             user=user.id)
+                bump(recipe_namespace(pk), user_namespace(user.id))
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            recipe = get_object_or_404(Recipe, id=pk)
             return Response(
                 {'errors': f'Рецепт "{recipe.name}" не найден в списке.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -244,28 +488,54 @@ class RecipeViewSet(ModelViewSet):
         """Добавление/удаление рецепта из избранного."""
         return self._handle_action(
             request, Favorite, AddFavoritesSerializer,
-            'Рецепт "{}" уже есть в избранном.', pk
+            'Рецепт "{}" уже есть в избранном.', pk,
+            counter='favorites_count'
         )
 
     @action(
         detail=True,
-        methods=('post', 'delete'),
+        methods=('post', 'patch', 'delete'),
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        """Добавление/удаление рецепта из списка покупок."""
+        """Добавление/удаление рецепта из списка покупок.
+
+        В POST и PATCH можно передать servings — на сколько порций
+        готовить рецепт; список покупок пересчитается.
+        """
+        servings = ShoppingCartServingsSerializer(data=request.data)
+        servings.is_valid(raise_exception=True)
+
+        if request.method == 'PATCH':
+            if 'servings' not in servings.validated_data:
+                raise ValidationError({'servings': 'Обязательное поле.'})
+            with transaction.atomic():
+                updated = ShoppingCart.objects.filter(
+                    user=request.user, recipe_id=pk
+                ).update(**servings.validated_data)
+                if updated:
+                    record_event(
+                        SHOPPING_CART, Event.Action.UPDATED, int(pk),
+                        user=request.user.id, **servings.validated_data)
+            if not updated:
+                return Response(
+                    {'errors': 'Рецепта нет в списке покупок.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(servings.data, status=status.HTTP_200_OK)
+
         return self._handle_action(
             request, ShoppingCart, AddFavoritesSerializer,
-            'Рецепт "{}" уже есть в списке покупок.', pk
+            'Рецепт "{}" уже есть в списке покупок.', pk,
+            extra=servings.validated_data
         )
 
     @staticmethod
     def ingredients_to_txt(ingredients):
         """Создание списка"""
         return '\n'.join(
-            f"{ingredient['ingredient__name']} - {ingredient['sum']} "
-            f"({ingredient['ingredient__measurement_unit']})"
-            for ingredient in ingredients
+            f'{name} - {amount} ({unit})'
+            for name, amount, unit in ingredients
         )
 
     @action(
@@ -275,13 +545,7 @@ class RecipeViewSet(ModelViewSet):
     )
     def download_shopping_cart(self, request):
         """Скачивание"""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-
+        ingredients = get_shopping_list(request.user)
         shopping_list = self.ingredients_to_txt(ingredients)
         return HttpResponse(shopping_list, content_type='text/plain')
 
@@ -290,18 +554,50 @@ class RecipeViewSet(ModelViewSet):
         """Генерирует короткую ссылку на рецепт."""
         recipe = self.get_object()
 
-        hashids = Hashids(salt='foodgramacheron', min_length=5)
-        short_code = hashids.encode(recipe.id)
+        short_code = get_hashids().encode(recipe.id)
 
         short_link = f'{settings.BASE_URL}{short_code}'
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
 
+@lru_cache(maxsize=None)
+def get_hashids():
+    """Кодировщик коротких ссылок; hashids импортируется при первом вызове."""
+    from hashids import Hashids
+    return Hashids(salt='foodgramacheron', min_length=5)
+
+
 def short_link_redirect(request, short_code):
     """Перенаправляет пользователя на страницу рецепта по короткой ссылке."""
-    hashids = Hashids(salt='foodgramacheron', min_length=5)
-    recipe_id = hashids.decode(short_code)
+    recipe_id = get_hashids().decode(short_code)
     if not recipe_id:
         return redirect('/')
     recipe = get_object_or_404(Recipe, id=recipe_id[0])
     return redirect(f'/recipes/{recipe.pk}/')
+
+
+def _int_param(request, name, default, maximum=None):
+    value = request.query_params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Ожидается целое число.'})
+    if value < 0 or (maximum is not None and value > maximum):
+        raise ValidationError({name: 'Значение вне допустимого диапазона.'})
+    return value
+
+
+@api_view(('GET',))
+@permission_classes((IsAdminUser,))
+def events_feed(request):
+    """Поток событий outbox для внутренних потребителей.
+
+    after — позиция из поля next предыдущего ответа.
+    """
+    try:
+        after = decode_position(request.query_params.get('after', '0-0'))
+    except ValueError:
+        raise ValidationError({'after': 'Некорректная позиция.'})
+    limit = _int_param(request, 'limit', STREAM_LIMIT, STREAM_LIMIT)
+    return StreamingHttpResponse(
+        stream_events(after, limit), content_type='application/json')
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from events.models import ConsumerOffset, Event
+from foodgram.paginator import EstimatedCountPaginator
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'action', 'object_id', 'created')
+    list_filter = ('topic', 'action')
+    readonly_fields = ('topic', 'action', 'object_id', 'payload',
+                       'transaction_id', 'created')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-отсутствует-'
+
+
+@admin.register(ConsumerOffset)
+class ConsumerOffsetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'transaction_id', 'position', 'updated')
+    empty_value_display = '-отсутствует-'
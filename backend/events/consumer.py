@@ -0,0 +1,50 @@
+from django.db import transaction
+
+from events.models import ConsumerOffset
+from events.outbox import START, visible_events
+
+BATCH_SIZE = 500
+
+
+class EventConsumer:
+    """Читает поток событий с сохранённой позиции.
+
+    Обработчик получает пачку событий; позиция сдвигается в той же
+    транзакции, поэтому изменения обработчика в базе и позиция
+    фиксируются вместе. Сбой обработчика — пачка придёт снова.
+    """
+
+    def __init__(self, name, batch_size=BATCH_SIZE):
+        self.name = name
+        self.batch_size = batch_size
+
+    @property
+    def position(self):
+        """(transaction_id, id) последнего обработанного события."""
+        offset = ConsumerOffset.objects.filter(name=self.name).first()
+        return (offset.transaction_id, offset.position) if offset else START
+
+    def run_once(self, handler):
+        """Обрабатывает одну пачку; возвращает число событий."""
+        with transaction.atomic():
+            offset, _ = ConsumerOffset.objects.select_for_update(
+            ).get_or_create(name=self.name)
+            events = list(visible_events(
+                (offset.transaction_id, offset.position), self.batch_size))
+            if not events:
+                return 0
+            handler(events)
+            offset.transaction_id = events[-1].transaction_id
+            offset.position = events[-1].id
+            offset.save(
+                update_fields=('transaction_id', 'position', 'updated'))
+        return len(events)
+
+    def run(self, handler):
+        """Обрабатывает пачки, пока не дочитает поток до конца."""
+        total = 0
+        while True:
+            processed = self.run_once(handler)
+            total += processed
+            if processed < self.batch_size:
+                return total
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='event',
+            options={'ordering': ('transaction_id', 'id'), 'verbose_name': 'Событие', 'verbose_name_plural': 'События'},
+        ),
+        migrations.AddField(
+            model_name='consumeroffset',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, verbose_name='Транзакция последнего обработанного события'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Номер транзакции PostgreSQL, записавшей событие.', verbose_name='Транзакция'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['transaction_id', 'id'], name='event_position_idx'),
+        ),
+    ]
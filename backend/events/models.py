@@ -0,0 +1,87 @@
+from django.db import models
+
+TOPIC_MAX_LENGTH = 50
+CONSUMER_NAME_MAX_LENGTH = 100
+
+
+class Event(models.Model):
+    """Событие об изменении данных (transactional outbox).
+
+    Пишется в той же транзакции, что и само изменение. Порядок потока —
+    (transaction_id, id): по этой паре потребители запоминают, докуда
+    дочитали.
+    """
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Создание'
+        UPDATED = 'updated', 'Изменение'
+        DELETED = 'deleted', 'Удаление'
+
+    topic = models.CharField(
+        max_length=TOPIC_MAX_LENGTH,
+        verbose_name='Тема'
+    )
+    action = models.CharField(
+        max_length=max(len(value) for value in Action.values),
+        choices=Action.choices,
+        verbose_name='Действие'
+    )
+    object_id = models.BigIntegerField(
+        verbose_name='Id объекта'
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Данные'
+    )
+    transaction_id = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Транзакция',
+        help_text='Номер транзакции PostgreSQL, записавшей событие.'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        verbose_name = 'Событие'
+        verbose_name_plural = 'События'
+        ordering = ('transaction_id', 'id')
+        indexes = [
+            models.Index(fields=['transaction_id', 'id'],
+                         name='event_position_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic}:{self.object_id} {self.get_action_display()}'
+
+
+class ConsumerOffset(models.Model):
+    """Докуда потребитель обработал поток событий."""
+
+    name = models.CharField(
+        max_length=CONSUMER_NAME_MAX_LENGTH,
+        unique=True,
+        verbose_name='Потребитель'
+    )
+    transaction_id = models.BigIntegerField(
+        default=0,
+        verbose_name='Транзакция последнего обработанного события'
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Id последнего обработанного события'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Позиция потребителя'
+        verbose_name_plural = 'Позиции потребителей'
+
+    def __str__(self):
+        return f'{self.name}: {self.transaction_id}-{self.position}'
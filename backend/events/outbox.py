@@ -0,0 +1,116 @@
+import json
+
+from django.db.models import BigIntegerField, Func, Q
+
+from events.models import Event
+
+RECIPE = 'recipe'
+FAVORITE = 'favorite'
+SHOPPING_CART = 'shopping_cart'
+FOLLOW = 'follow'
+
+STREAM_LIMIT = 10_000
+CHUNK_SIZE = 2000
+START = (0, 0)
+
+
+class CurrentTransactionId(Func):
+    """Номер текущей транзакции.
+
+    В SQLite записи идут строго по очереди, и порядок id совпадает
+    с порядком фиксации, поэтому номер не нужен.
+    """
+
+    template = 'txid_current()'
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return '0', []
+
+
+class SnapshotXmin(Func):
+    """Наименьший номер транзакции, ещё не завершённой для снимка.
+
+    Все транзакции с меньшим номером уже зафиксированы или отменены.
+    """
+
+    template = 'txid_snapshot_xmin(txid_current_snapshot())'
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return str(2 ** 63 - 1), []
+
+
+def record_event(topic, action, object_id, **payload):
+    """Записывает событие; вызывать внутри транзакции изменения."""
+    Event.objects.create(
+        topic=topic, action=action, object_id=object_id, payload=payload,
+        transaction_id=CurrentTransactionId())
+
+
+def record_events(topic, action, object_ids, payloads=None):
+    """Записывает события пачкой; payloads — данные каждого события."""
+    object_ids = list(object_ids)
+    payloads = payloads or [{}] * len(object_ids)
+    Event.objects.bulk_create(
+        Event(topic=topic, action=action, object_id=object_id,
+              payload=payload, transaction_id=CurrentTransactionId())
+        for object_id, payload in zip(object_ids, payloads)
+    )
+
+
+def encode_position(position):
+    return '{}-{}'.format(*position)
+
+
+def decode_position(value):
+    """(transaction_id, id) из строки вида «123-45»."""
+    transaction_id, _, event_id = value.partition('-')
+    position = int(transaction_id), int(event_id)
+    if min(position) < 0:
+        raise ValueError(value)
+    return position
+
+
+def visible_events(after, limit):
+    """События после позиции after из завершённых транзакций.
+
+    Транзакции с номером меньше xmin снимка уже завершены, а ещё не
+    видимые события получат номер не меньше xmin. Поэтому поток по
+    (transaction_id, id) не пропустит транзакцию, зафиксированную
+    позже, чем начались следующие.
+    """
+    transaction_id, event_id = after
+    return Event.objects.filter(
+        Q(transaction_id__gt=transaction_id)
+        | Q(transaction_id=transaction_id, id__gt=event_id),
+        transaction_id__lt=SnapshotXmin(),
+    ).order_by('transaction_id', 'id')[:limit]
+
+
+def event_to_dict(event):
+    return {
+        'id': event.id,
+        'topic': event.topic,
+        'action': event.action,
+        'object_id': event.object_id,
+        'payload': event.payload,
+        'created': event.created.isoformat(),
+    }
+
+
+def stream_events(after, limit=STREAM_LIMIT):
+    """Потоково отдаёт события после позиции after в виде JSON.
+
+    next — позиция последнего отданного события, с неё продолжают
+    чтение.
+    """
+    last = after
+    yield '{"events": ['
+    for position, event in enumerate(
+        visible_events(after, limit).iterator(chunk_size=CHUNK_SIZE)
+    ):
+        data = json.dumps(event_to_dict(event), ensure_ascii=False)
+        yield data if not position else f',{data}'
+        last = event.transaction_id, event.id
+    yield f'], "next": "{encode_position(last)}"}}'
@@ -0,0 +1,99 @@
+import json
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10_000
+
+
+def planner_estimate(queryset):
+    """Оценка числа строк от планировщика PostgreSQL или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    plan = queryset.order_by().explain(format='json')
+    return json.loads(plan)[0]['Plan']['Plan Rows']
+
+
+def estimate_count(queryset, threshold=ESTIMATE_THRESHOLD):
+    """Число строк выборки: точное до порога, дальше оценка.
+
+    Точный подсчёт ограничен LIMIT, поэтому на больших таблицах
+    не читает их целиком. Возвращает пару (число, точное ли оно).
+    """
+    bounded = queryset.order_by()[:threshold].count()
+    if bounded < threshold:
+        return bounded, True
+    estimate = planner_estimate(queryset)
+    if estimate is None or estimate < 0:
+        return queryset.count(), True
+    return max(estimate, threshold), False
+
+
+class EstimatedPage(Page):
+    """Страница, которая знает о следующей без точного числа страниц."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без полного COUNT(*) на больших выборках.
+
+    Если число строк оценено, номер страницы не сверяется с ним,
+    а наличие следующей страницы определяется по лишней строке.
+    """
+
+    threshold = ESTIMATE_THRESHOLD
+
+    @cached_property
+    def _count(self):
+        if not hasattr(self.object_list, 'query'):
+            return len(self.object_list), True
+        return estimate_count(self.object_list, self.threshold)
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count[1]
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является числом.')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1.')
+        return number
+
+    def page(self, number):
+        if self.count_is_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not object_list and number > 1:
+            raise EmptyPage('На этой странице нет результатов.')
+        return EstimatedPage(
+            object_list[:self.per_page], number, self,
+            has_more=len(object_list) > self.per_page
+        )
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'users.apps.UsersConfig',
@@ -32,16 +33,22 @@ INSTALLED_APPS = [
     'drf_yasg',
     'django_filters',
     'recipes',
+    'jobs.apps.JobsConfig',
+    'events.apps.EventsConfig',
+    'media.apps.MediaConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.BudgetMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -104,7 +111,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -132,6 +139,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'media.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -140,3 +156,28 @@ FILE_NAME = 'shopping_cart.txt'
 CSV_FILES_DIR = os.path.join(BASE_DIR, 'data')
 
 BASE_URL = 'https://foodgramacheron.zapto.org/s/'
+
+# Превышение бюджета запросов/времени: ошибка или только предупреждение.
+PERFORMANCE_BUDGETS_STRICT = os.getenv(
+    'PERFORMANCE_BUDGETS_STRICT', str(DEBUG)).lower() == 'true'
+
+# Профилировать каждый N-й запрос к маршруту API (0 — выключено).
+PROFILING_SAMPLE_RATE = int(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_RING_SIZE = 20
+PROFILING_FLUSH_EVERY = 10
+
+# Общий для процессов кэш: в нём лежат и версии пространств имён,
+# по которым сбрасываются локальные кэши (foodgram.versions).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 50_000},
+    }
+}
+# Как часто локальный кэш сверяет версии с общим, мс.
+CACHE_VERSION_CHECK_MS = int(os.getenv('CACHE_VERSION_CHECK_MS', 500))
+
+# Ответы меньше этого размера, байт, не сжимаются.
+COMPRESSION_MIN_SIZE = 1024
@@ -0,0 +1,25 @@
+"""Облегчённые настройки для воркеров и management-команд.
+
+Процессам без HTTP не нужны админка, статика, djoser и генератор
+схем: без них django.setup() заметно быстрее. Включается через
+DJANGO_SETTINGS_MODULE=foodgram.settings_lean.
+"""
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import INSTALLED_APPS, MIDDLEWARE
+
+LEAN_EXCLUDED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'djoser',
+    'drf_yasg',
+}
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in LEAN_EXCLUDED_APPS
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if 'messages' not in middleware
+]
@@ -0,0 +1,57 @@
+import multiprocessing
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from foodgram.versions import (VERSION_KEY, VersionedCache, _bump,
+                               read_versions)
+
+BUMPS_PER_PROCESS = 200
+NAMESPACE = 'test'
+
+
+def bump_many(count):
+    for _ in range(count):
+        _bump((NAMESPACE,))
+
+
+def run_in_processes(target, *args, processes=2):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=target, args=args)
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        if worker.exitcode:
+            raise AssertionError(f'Процесс завершился с кодом '
+                                 f'{worker.exitcode}')
+
+
+class FileCacheVersionTests(SimpleTestCase):
+    """Версии пространств в общем файловом кэше двух процессов."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_concurrent_bumps_are_not_lost(self):
+        start = read_versions((NAMESPACE,))[NAMESPACE]
+        run_in_processes(bump_many, BUMPS_PER_PROCESS)
+        self.assertEqual(
+            cache.get(VERSION_KEY.format(NAMESPACE)),
+            start + 2 * BUMPS_PER_PROCESS)
+
+    def test_bump_in_other_process_invalidates_local_cache(self):
+        local = VersionedCache(check_interval=0)
+        local.set('key', (NAMESPACE,), 'value')
+        self.assertEqual(local.get('key'), 'value')
+        run_in_processes(bump_many, 1, processes=1)
+        self.assertIsNone(local.get('key'))
@@ -0,0 +1,36 @@
+from django.db import transaction
+
+
+class _Coalesced:
+    """Отложенный до фиксации вызов, копящий аргументы."""
+
+    def __init__(self, key, callback):
+        self.key = key
+        self.callback = callback
+        self.items = []
+
+    def __call__(self):
+        self.callback(list(dict.fromkeys(self.items)))
+
+
+def on_commit_coalesced(key, items, callback):
+    """Вызывает callback один раз после фиксации транзакции.
+
+    Все items, переданные с одним key до фиксации, собираются в один
+    список без повторов. Вызов присоединяется к уже отложенному, только
+    если тот переживёт откат всех текущих точек сохранения, — иначе
+    откат вложенного блока потерял бы items внешнего.
+    Вне транзакции callback вызывается сразу.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        current = set(connection.savepoint_ids)
+        for entry in connection.run_on_commit:
+            savepoints, func = entry[0], entry[1]
+            if (isinstance(func, _Coalesced) and func.key == key
+                    and savepoints <= current):
+                func.items.extend(items)
+                return
+    pending = _Coalesced(key, callback)
+    pending.items.extend(items)
+    transaction.on_commit(pending)
@@ -14,12 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.apps import apps
 from django.contrib import admin
 from django.urls import include, path
 from api.views import short_link_redirect
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path(
         's/<str:short_code>/',
@@ -27,3 +27,7 @@ urlpatterns = [
         name='short_link_redirect'
     ),
 ]
+
+# В облегчённых настройках (foodgram.settings_lean) админки нет.
+if apps.is_installed('django.contrib.admin'):
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
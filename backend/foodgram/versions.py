@@ -0,0 +1,190 @@
+import fcntl
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.transactions import on_commit_coalesced
+
+CATALOG = 'catalog'
+VERSION_KEY = 'ns-version:{}'
+LOCK_FILE = 'ns-version.lock'
+LOCAL_CACHE_SIZE = 2048
+
+_local_caches = weakref.WeakSet()
+
+
+def recipe_namespace(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def user_namespace(user_id):
+    return f'user:{user_id}'
+
+
+def _new_version():
+    # Версия, потерянная при вытеснении из кэша, не должна совпасть
+    # со старой, поэтому начальное значение берётся от времени.
+    return time.time_ns()
+
+
+def read_versions(namespaces):
+    """Текущие версии пространств имён из общего кэша."""
+    keys = {VERSION_KEY.format(namespace): namespace
+            for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, namespace in keys.items():
+        if namespace not in versions:
+            cache.add(key, _new_version(), None)
+            versions[namespace] = cache.get(key)
+    return versions
+
+
+@contextmanager
+def _file_lock(directory):
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _version_lock():
+    """Замок на чтение и запись версии между процессами.
+
+    incr файлового кэша — это get и set; без замка два процесса
+    прочитают одну версию и запишут одну и ту же следующую, и второе
+    изменение останется незамеченным. В Redis и Memcached incr
+    атомарен сам, замок не нужен.
+    """
+    directory = getattr(cache, '_dir', None)
+    if directory is None:
+        return nullcontext()
+    os.makedirs(directory, exist_ok=True)
+    return _file_lock(directory)
+
+
+def _bump(namespaces):
+    # Свой процесс видит запись сразу, не дожидаясь интервала проверки.
+    for local in list(_local_caches):
+        local.forget(namespaces)
+    with _version_lock():
+        for namespace in namespaces:
+            key = VERSION_KEY.format(namespace)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _new_version(), None)
+            else:
+                # incr файлового кэша ставит срок по умолчанию.
+                cache.touch(key, None)
+
+
+def bump(*namespaces):
+    """Делает устаревшими локальные кэши пространств во всех процессах.
+
+    Версия меняется после фиксации транзакции: иначе другой процесс
+    успел бы закэшировать старые данные уже под новой версией.
+    Повторные вызовы в одной транзакции сливаются в один сброс.
+    """
+    on_commit_coalesced('versions.bump', namespaces, _bump)
+
+
+class VersionedCache:
+    """LRU-кэш процесса, записи которого привязаны к версиям пространств.
+
+    Версии сверяются с общим кэшем не чаще раза в check_interval
+    секунд, поэтому между проверками запись может быть устаревшей
+    не дольше этого интервала.
+    """
+
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE, check_interval=None):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.items = OrderedDict()
+        self.versions = {}
+        self.lock = Lock()
+        _local_caches.add(self)
+
+    def _interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return settings.CACHE_VERSION_CHECK_MS / 1000
+
+    def current(self, namespaces):
+        """Версии пространств, перечитывая из общего кэша устаревшие."""
+        now = time.monotonic()
+        interval = self._interval()
+        with self.lock:
+            known = {
+                namespace: self.versions[namespace][1]
+                for namespace in namespaces
+                if namespace in self.versions
+                and now - self.versions[namespace][0] < interval
+            }
+        stale = [namespace for namespace in namespaces
+                 if namespace not in known]
+        if stale:
+            fresh = read_versions(stale)
+            with self.lock:
+                for namespace, version in fresh.items():
+                    self.versions[namespace] = (now, version)
+            known.update(fresh)
+        return tuple(known[namespace] for namespace in namespaces)
+
+    def get(self, key):
+        """Значение, если версии его пространств не изменились."""
+        with self.lock:
+            item = self.items.get(key)
+        if item is None:
+            return None
+        namespaces, versions, value = item
+        if self.current(namespaces) != versions:
+            with self.lock:
+                if self.items.get(key) is item:
+                    del self.items[key]
+            return None
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+        return value
+
+    def set(self, key, namespaces, value, versions=None):
+        """Сохраняет значение с версиями, прочитанными до его вычисления.
+
+        Если versions не переданы, берутся текущие: тогда изменение,
+        случившееся во время вычисления, может остаться незамеченным
+        до следующей записи в пространство.
+        """
+        namespaces = tuple(namespaces)
+        if versions is None:
+            versions = self.current(namespaces)
+        with self.lock:
+            self.items[key] = (namespaces, versions, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+            while len(self.versions) > self.maxsize * 4:
+                self.versions.pop(next(iter(self.versions)))
+
+    def get_or_set(self, key, namespaces, default):
+        """Значение из кэша или результат default(), сохранённый в кэш."""
+        value = self.get(key)
+        if value is None:
+            versions = self.current(namespaces)
+            value = default()
+            self.set(key, namespaces, value, versions)
+        return value
+
+    def forget(self, namespaces):
+        """Забывает версии пространств, чтобы перечитать их сразу."""
+        with self.lock:
+            for namespace in namespaces:
+                self.versions.pop(namespace, None)
@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import claim_jobs, execute_job, release_stale_jobs
+
+POLL_INTERVAL = 1.0
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Количество процессов-воркеров')
+        parser.add_argument(
+            '--poll-interval', type=float, default=POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунды')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            running = set()
+            while True:
+                release_stale_jobs()
+                # Новые задачи берутся по мере освобождения процессов:
+                # одна долгая задача не задерживает остальные.
+                free = processes - len(running)
+                if free:
+                    running |= {
+                        pool.submit(execute_job, job_id)
+                        for job_id in claim_jobs(limit=free)
+                    }
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, running = wait(
+                    running, timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED)
+                if done:
+                    results = [future.result() for future in done]
+                    self.stdout.write(
+                        f'Выполнено задач: {sum(results)}, '
+                        f'с ошибкой: {len(results) - sum(results)}'
+                    )
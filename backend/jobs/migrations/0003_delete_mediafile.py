@@ -0,0 +1,16 @@
+# Generated by Django 4.2.19 on 2026-10-19 09:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_mediafile'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='MediaFile',
+        ),
+    ]
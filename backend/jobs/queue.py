@@ -0,0 +1,54 @@
+from functools import partial
+
+from django.db import transaction
+
+from foodgram.transactions import on_commit_coalesced
+from jobs.models import DEFAULT_MAX_ATTEMPTS, Job
+
+TASKS = {}
+
+
+def task(name=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Регистрирует функцию как фоновую задачу.
+
+    Задачи ищутся в модулях tasks.py приложений при старте Django.
+    """
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, **payload):
+    """Ставит задачу в очередь немедленно."""
+    return Job.objects.create(
+        name=func.task_name,
+        payload=payload,
+        max_attempts=func.max_attempts
+    )
+
+
+def enqueue_on_commit(func, **payload):
+    """Ставит задачу в очередь после фиксации текущей транзакции."""
+    transaction.on_commit(partial(enqueue, func, **payload))
+
+
+def enqueue_once(func, **payload):
+    """Ставит задачу, если такая же ещё ждёт в очереди — не ставит."""
+    pending = Job.objects.filter(
+        name=func.task_name, payload=payload, status=Job.Status.PENDING)
+    if not pending.exists():
+        enqueue(func, **payload)
+
+
+def enqueue_once_on_commit(func, **payload):
+    """Одна задача на транзакцию, сколько бы раз её ни ставили.
+
+    Для задач, которые пересчитывают всё целиком: повторять их ради
+    каждой изменённой строки незачем.
+    """
+    on_commit_coalesced(
+        ('enqueue', func.task_name, repr(sorted(payload.items()))), (),
+        lambda items: enqueue_once(func, **payload))
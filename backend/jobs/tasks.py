@@ -0,0 +1,10 @@
+from django.core.files.storage import default_storage
+
+from jobs.queue import task
+
+
+@task()
+def delete_media_file(name):
+    """Удаляет файл из хранилища медиа."""
+    if name:
+        default_storage.delete(name)
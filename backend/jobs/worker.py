@@ -0,0 +1,92 @@
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import TASKS
+
+RETRY_DELAY = timedelta(seconds=10)
+MAX_RETRY_DELAY = timedelta(hours=1)
+# Выполняющаяся задача продлевает блокировку каждые HEARTBEAT_INTERVAL;
+# задача без отметок дольше LOCK_TIMEOUT считается брошенной.
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой."""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def release_stale_jobs():
+    """Возвращает в очередь задачи упавших воркеров."""
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - LOCK_TIMEOUT
+    ).update(status=Job.Status.PENDING, locked_at=None)
+
+
+def claim_jobs(limit):
+    """Забирает готовые к запуску задачи, пропуская занятые другими."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.Status.PENDING, run_at__lte=now
+            ).values_list('id', flat=True)[:limit]
+        )
+        Job.objects.filter(id__in=ids).update(
+            status=Job.Status.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    return ids
+
+
+def _heartbeat(job_id, stop):
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL.total_seconds()):
+            Job.objects.filter(
+                id=job_id, status=Job.Status.RUNNING
+            ).update(locked_at=timezone.now())
+    finally:
+        # Соединения у каждого потока свои — закрываем соединение пульса.
+        connections.close_all()
+
+
+def execute_job(job_id):
+    """Выполняет задачу; при ошибке планирует повтор или помечает сбой.
+
+    Пока задача выполняется, отдельный поток продлевает её блокировку,
+    чтобы долгую задачу не забрал и не запустил повторно другой воркер.
+    """
+    close_old_connections()
+    job = Job.objects.get(id=job_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        TASKS[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.Status.FAILED
+        else:
+            job.status = Job.Status.PENDING
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=(
+            'status', 'run_at', 'locked_at', 'last_error'))
+        return False
+    else:
+        job.delete()
+        return True
+    finally:
+        stop.set()
+        heartbeat.join()
+        close_old_connections()
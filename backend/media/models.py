@@ -0,0 +1,24 @@
+from django.db import models
+
+MEDIA_NAME_MAX_LENGTH = 255
+
+
+class MediaFile(models.Model):
+    """Строка-замок файла медиа.
+
+    Загрузка файла и проверка ссылок перед его удалением блокируют
+    эту строку, поэтому удаление не разминётся с новой ссылкой.
+    """
+
+    name = models.CharField(
+        max_length=MEDIA_NAME_MAX_LENGTH,
+        unique=True,
+        verbose_name='Путь в хранилище'
+    )
+
+    class Meta:
+        verbose_name = 'Файл медиа'
+        verbose_name_plural = 'Файлы медиа'
+
+    def __str__(self):
+        return self.name
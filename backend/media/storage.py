@@ -0,0 +1,116 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import FileField
+
+HASH_CHUNK_SIZE = 64 * 1024
+# Два уровня по два hex-символа: не больше 256 записей в каталоге.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, читаемого по частям."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sharded_name(directory, digest, extension):
+    """recipes/ab/cd/abcd….png — путь файла по хешу содержимого."""
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+    return posixpath.join(directory, *shards, digest + extension.lower())
+
+
+def file_references(name):
+    """Сколько записей в базе ссылаются на файл.
+
+    Поля файлов проиндексированы, поэтому каждый подсчёт — поиск
+    по индексу.
+    """
+    return sum(
+        model._base_manager.filter(**{field.name: name}).count()
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField)
+    )
+
+
+def lock_file(name):
+    """Блокирует строку файла до конца текущей транзакции.
+
+    Строку могло удалить удаление файла, которого ждала блокировка, —
+    тогда она создаётся заново.
+    """
+    # Хранилище загружается раньше моделей, поэтому импорт здесь.
+    from media.models import MediaFile
+
+    while True:
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name)], ignore_conflicts=True)
+        if MediaFile.objects.select_for_update().filter(name=name).exists():
+            return
+
+
+def unlock_file(name):
+    """Удаляет строку-замок файла, которого больше нет."""
+    from media.models import MediaFile
+
+    MediaFile.objects.filter(name=name).delete()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище медиа с адресацией по содержимому.
+
+    Имя файла — хеш его содержимого внутри каталога upload_to,
+    разложенный по подкаталогам. Одинаковые загрузки попадают в один
+    файл, поэтому имя никогда не меняет содержимое и nginx может
+    отдавать его как immutable. Файл удаляется, только когда на него
+    не осталось ссылок в базе.
+
+    Запись и удаление файла блокируют его строку MediaFile. Сохранять
+    файл нужно в транзакции, которая запишет ссылку на него: тогда
+    удаление дождётся её фиксации и увидит ссылку.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое — переименовывать
+        # нечего.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        name = sharded_name(
+            directory, content_hash(content), os.path.splitext(filename)[1])
+        with transaction.atomic():
+            lock_file(name)
+            if not self.exists(name):
+                self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        # Пишем во временный файл и атомарно переносим: параллельная
+        # загрузка того же содержимого перезапишет файл им же.
+        temporary = super()._save(
+            posixpath.join(posixpath.dirname(name), f'.{uuid.uuid4().hex}'),
+            content
+        )
+        os.replace(self.path(temporary), self.path(name))
+
+    def delete(self, name):
+        if not name:
+            return
+        with transaction.atomic():
+            lock_file(name)
+            if not file_references(name):
+                super().delete(name)
+                unlock_file(name)
@@ -1,11 +1,18 @@
 from django.contrib import admin
+
+from foodgram.paginator import EstimatedCountPaginator
 from recipes import models
+from recipes.purge import soft_delete_recipes
+from recipes.rankings import change_ingredient_usage
+from jobs.queue import enqueue_on_commit
+from recipes.signals import touch_recipes
+from recipes.tasks import repair_favorite_counts
 
 
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name',)
     empty_value_display = '-отсутствует-'
 
@@ -23,14 +30,27 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'get_favorites_count',
                     'cooking_time', 'text', 'get_tags', 'image')
     list_editable = ('name', 'cooking_time', 'text', 'image', 'author')
+    list_select_related = ('author',)
     readonly_fields = ('get_favorites_count',)
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
     search_fields = ('name', 'author__username', 'tags__name')
+    raw_id_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-отсутствует-'
 
-    @admin.display(description='В избранном')
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('tags')
+
+    def delete_model(self, request, obj):
+        soft_delete_recipes([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_recipes(queryset.values_list('pk', flat=True))
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def get_favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     @admin.display(description='Теги')
     def get_tags(self, obj):
@@ -41,10 +61,35 @@ class RecipeAdmin(admin.ModelAdmin):
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'get_recipe_name', 'get_ingredient_name', 'amount')
     list_editable = ('amount',)
+    list_select_related = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
-    list_filter = ('recipe', 'ingredient')
+    raw_id_fields = ('recipe',)
+    autocomplete_fields = ('ingredient',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-отсутствует-'
 
+    def save_model(self, request, obj, form, change):
+        previous = form.initial.get('ingredient') if change else None
+        super().save_model(request, obj, form, change)
+        if previous != obj.ingredient_id:
+            change_ingredient_usage([obj.ingredient_id], 1)
+            if previous is not None:
+                change_ingredient_usage([previous], -1)
+        touch_recipes([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        change_ingredient_usage([obj.ingredient_id], -1)
+        touch_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('recipe_id', 'ingredient_id'))
+        super().delete_queryset(request, queryset)
+        change_ingredient_usage(
+            [ingredient_id for _, ingredient_id in rows], -1)
+        touch_recipes({recipe_id for recipe_id, _ in rows})
+
     @admin.display(description='Рецепт')
     def get_recipe_name(self, obj):
         return obj.recipe.name
@@ -59,10 +104,33 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'get_user_username', 'get_recipe_name',
                     'user', 'recipe')
     list_editable = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-отсутствует-'
 
+    # Счётчик избранного у рецепта меняет только API, поэтому правки
+    # здесь сверяются в фоне.
+    def save_model(self, request, obj, form, change):
+        previous = form.initial.get('recipe') if change else None
+        super().save_model(request, obj, form, change)
+        self.repair_counts({obj.recipe_id, previous} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.repair_counts([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.repair_counts(recipe_ids)
+
+    @staticmethod
+    def repair_counts(recipe_ids):
+        enqueue_on_commit(repair_favorite_counts, recipe_ids=list(recipe_ids))
+
     @admin.display(description='Пользователь')
     def get_user_username(self, obj):
         return obj.user.username
@@ -77,8 +145,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'get_user_username', 'get_recipe_name',
                     'user', 'recipe')
     list_editable = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-отсутствует-'
 
     @admin.display(description='Пользователь')
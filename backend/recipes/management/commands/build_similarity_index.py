@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import BATCH_SIZE, TOP_K, build_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild MinHash/LSH index of similar recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=TOP_K,
+            help='Сколько похожих рецептов хранить для каждого')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Размер пачки при чтении и записи')
+
+    def handle(self, *args, **options):
+        count = build_similarity_index(
+            top_k=options['top'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар похожих рецептов: {count}'))
@@ -0,0 +1,65 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+CHUNK_SIZE = 2000
+
+
+def recipe_to_dict(recipe):
+    """Представление рецепта для строки JSONL."""
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'servings': recipe.servings,
+        'author': recipe.author.email,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredient_list.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Export recipes to JSONL, one recipe per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько рецептов читать из базы за раз')
+        parser.add_argument(
+            '--ids', type=int, nargs='+',
+            help='Выгрузить только рецепты с указанными id')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'ingredient_list__ingredient'
+        ).order_by('id')
+        if options['ids']:
+            recipes = recipes.filter(id__in=options['ids'])
+
+        output = options['output']
+        file = open(output, 'w', encoding='utf-8') if output else sys.stdout
+        count = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                file.write(json.dumps(recipe_to_dict(recipe),
+                                      ensure_ascii=False))
+                file.write('\n')
+                count += 1
+        finally:
+            if output:
+                file.close()
+
+        self.stderr.write(self.style.SUCCESS(f'Выгружено рецептов: {count}'))
@@ -0,0 +1,168 @@
+import heapq
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import FileField
+
+CHUNK_SIZE = 100_000
+GRACE_HOURS = 24
+WORKERS = 8
+
+
+def batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def scan_files(root):
+    """Пути всех файлов под root относительно него, через os.scandir."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root).replace(
+                        os.sep, '/')
+
+
+def referenced_files(chunk_size):
+    """Имена файлов, на которые ссылаются поля моделей.
+
+    Учитываются и мягко удалённые записи: их файлы сотрёт очистка.
+    """
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField):
+                yield from model._base_manager.exclude(
+                    **{field.name: ''}
+                ).filter(**{f'{field.name}__isnull': False}).values_list(
+                    field.name, flat=True
+                ).iterator(chunk_size=chunk_size)
+
+
+def external_sort(items, chunk_size, runs):
+    """Сортирует поток с ограниченной памятью.
+
+    Куски по chunk_size строк сортируются в памяти и сбрасываются во
+    временные файлы, затем сливаются heapq.merge. Файлы добавляются
+    в список runs, чтобы вызывающий код их закрыл.
+    """
+    own_runs = []
+    for batch in batches(items, chunk_size):
+        run = tempfile.TemporaryFile('w+', encoding='utf-8')
+        run.writelines(f'{name}\n' for name in sorted(set(batch)))
+        run.seek(0)
+        own_runs.append(run)
+    runs.extend(own_runs)
+    return heapq.merge(*(
+        (line.rstrip('\n') for line in run) for run in own_runs
+    ))
+
+
+def orphans(files, referenced):
+    """Имена из files, которых нет в referenced; оба потока отсортированы."""
+    referenced = iter(referenced)
+    current = next(referenced, None)
+    for name in files:
+        while current is not None and current < name:
+            current = next(referenced, None)
+        if name != current:
+            yield name
+
+
+class Command(BaseCommand):
+    help = 'Delete media files that no database row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено')
+        parser.add_argument(
+            '--grace-hours', type=float, default=GRACE_HOURS,
+            help='Не трогать файлы моложе этого срока')
+        parser.add_argument(
+            '--workers', type=int, default=WORKERS,
+            help='Сколько потоков удаляют файлы')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько имён сортировать в памяти за раз')
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        if not os.path.isdir(root):
+            raise CommandError(f'Каталог {root} не найден.')
+        self.cutoff = time.time() - options['grace_hours'] * 3600
+        self.dry_run = options['dry_run']
+        self.stats = Counter()
+        chunk_size = options['chunk_size']
+        runs = []
+        try:
+            files = external_sort(
+                self.count(scan_files(root), 'files'), chunk_size, runs)
+            referenced = external_sort(
+                self.count(referenced_files(chunk_size), 'references'),
+                chunk_size, runs)
+            with ThreadPoolExecutor(options['workers']) as executor:
+                for batch in batches(orphans(files, referenced), chunk_size):
+                    self.stats['orphans'] += len(batch)
+                    for result, size in executor.map(
+                        lambda name: self.collect(root, name), batch
+                    ):
+                        self.stats[result] += 1
+                        self.stats['bytes'] += size
+        finally:
+            for run in runs:
+                run.close()
+
+        action = 'можно удалить' if self.dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {self.stats["files"]}, '
+            f'ссылок: {self.stats["references"]}, '
+            f'сирот: {self.stats["orphans"]}, '
+            f'{action}: {self.stats["deleted"]} '
+            f'({self.stats["bytes"] / 1024 / 1024:.1f} МБ), '
+            f'моложе срока: {self.stats["young"]}, '
+            f'снова используются: {self.stats["referenced"]}, '
+            f'ошибок: {self.stats["errors"]}'
+        ))
+
+    def count(self, items, key):
+        for item in items:
+            self.stats[key] += 1
+            yield item
+
+    def collect(self, root, name):
+        """Удаляет файл-сироту, если он старше срока ожидания.
+
+        Удаляет хранилище: оно блокирует файл и заново проверяет ссылки,
+        поэтому файл, который успели загрузить снова, останется.
+        """
+        path = os.path.join(root, name)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime > self.cutoff:
+                return 'young', 0
+            if not self.dry_run:
+                default_storage.delete(name)
+                if default_storage.exists(name):
+                    return 'referenced', 0
+        except FileNotFoundError:
+            return 'missing', 0
+        except OSError as error:
+            self.stderr.write(f'{name}: {error}')
+            return 'errors', 0
+        return 'deleted', stat.st_size
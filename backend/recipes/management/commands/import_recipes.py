@@ -0,0 +1,219 @@
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from events.models import Event
+from events.outbox import RECIPE, record_events
+from foodgram.versions import CATALOG, bump, recipe_namespace
+from jobs.queue import enqueue_on_commit
+from recipes.models import (MAX_AMOUNT, MAX_COOKING_TIME, MAX_SERVINGS,
+                            MIN_VALUE, Ingredient, Recipe, RecipeIngredient,
+                            Tag, tag_mask)
+from recipes.rankings import change_ingredient_usage
+from recipes.tasks import update_similar_recipes_batch
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+REQUIRED_FIELDS = (
+    'name', 'text', 'cooking_time', 'author', 'ingredients', 'tags')
+
+
+def read_batches(file, batch_size):
+    """Читает JSONL-файл пачками пар (номер строки, текст).
+
+    Файл не загружается целиком; пустые строки пропускаются.
+    """
+    lines = (
+        (number, line) for number, line in enumerate(file, 1)
+        if line.strip()
+    )
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _is_int_in_range(value, minimum, maximum):
+    return (isinstance(value, int) and not isinstance(value, bool)
+            and minimum <= value <= maximum)
+
+
+def validate_item(item):
+    """Причина, по которой запись нельзя загрузить, или None."""
+    if not isinstance(item, dict):
+        return 'ожидается объект'
+    missing = [field for field in REQUIRED_FIELDS if field not in item]
+    if missing:
+        return f'нет полей: {", ".join(missing)}'
+    if not isinstance(item['name'], str) or not item['name'].strip():
+        return 'пустое название'
+    if not isinstance(item['text'], str):
+        return 'text должен быть строкой'
+    if not _is_int_in_range(
+            item['cooking_time'], MIN_VALUE, MAX_COOKING_TIME):
+        return 'некорректное cooking_time'
+    if not _is_int_in_range(
+            item.get('servings', 1), MIN_VALUE, MAX_SERVINGS):
+        return 'некорректное servings'
+    if not isinstance(item.get('image', ''), str):
+        return 'image должен быть строкой'
+    if not isinstance(item['tags'], list):
+        return 'tags должен быть списком'
+    if not all(isinstance(slug, str) for slug in item['tags']):
+        return 'тег должен быть строкой'
+    # Повтор упал бы на уникальности связи и откатил всю пачку.
+    if len(item['tags']) != len(set(item['tags'])):
+        return 'теги не уникальные'
+    if not isinstance(item['ingredients'], list):
+        return 'ingredients должен быть списком'
+    for element in item['ingredients']:
+        if not isinstance(element, dict) or not {
+                'name', 'measurement_unit', 'amount'} <= element.keys():
+            return 'ингредиент без name, measurement_unit или amount'
+        if not (isinstance(element['name'], str)
+                and isinstance(element['measurement_unit'], str)):
+            return 'name и measurement_unit должны быть строками'
+        if not _is_int_in_range(element['amount'], MIN_VALUE, MAX_AMOUNT):
+            return f'некорректное количество: {element["name"]}'
+    ingredients = {
+        (element['name'], element['measurement_unit'])
+        for element in item['ingredients']
+    }
+    if len(ingredients) != len(item['ingredients']):
+        return 'ингредиенты не уникальные'
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from JSONL produced by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к JSONL-файлу')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько рецептов записывать за одну транзакцию')
+
+    def handle(self, *args, **options):
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit').iterator()
+        }
+        self.tags = {
+            slug: (pk, bit)
+            for slug, pk, bit in Tag.objects.values_list('slug', 'id', 'bit')
+        }
+        self.authors = {}
+        created = skipped = 0
+
+        with open(options['path'], 'r', encoding='utf-8') as file:
+            for batch in read_batches(file, options['batch_size']):
+                batch_created = self.import_batch(batch)
+                created += batch_created
+                skipped += len(batch) - batch_created
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {created}, пропущено: {skipped}'))
+
+    def load_authors(self, items):
+        """Подгружает id авторов пачки, которых ещё нет в словаре."""
+        missing = {item['author'] for _, item in items} - self.authors.keys()
+        if missing:
+            self.authors.update(
+                User.objects.filter(email__in=missing).values_list(
+                    'email', 'id'))
+
+    def build_recipe(self, item):
+        """Собирает рецепт со связями или возвращает None с причиной."""
+        author_id = self.authors.get(item['author'])
+        if author_id is None:
+            return None, f'автор {item["author"]} не найден'
+        try:
+            ingredients = [
+                (self.ingredients[(element['name'],
+                                   element['measurement_unit'])],
+                 element['amount'])
+                for element in item['ingredients']
+            ]
+            tags = [self.tags[slug] for slug in item['tags']]
+        except KeyError as error:
+            return None, f'нет в справочнике: {error.args[0]}'
+        recipe = Recipe(
+            author_id=author_id,
+            name=item['name'],
+            text=item['text'],
+            cooking_time=item['cooking_time'],
+            servings=item.get('servings', 1),
+            image=item.get('image', ''),
+            tag_mask=tag_mask(bit for _, bit in tags),
+        )
+        return (recipe, ingredients, tags), None
+
+    def parse_batch(self, batch):
+        """Разбирает строки пачки; ошибочные пропускает с сообщением."""
+        items = []
+        for number, line in batch:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as error:
+                self.skip(number, f'некорректный JSON: {error.msg}')
+                continue
+            error = validate_item(item)
+            if error is not None:
+                self.skip(number, error)
+                continue
+            items.append((number, item))
+        return items
+
+    def skip(self, number, error):
+        self.stderr.write(f'Строка {number} пропущена: {error}')
+
+    def import_batch(self, batch):
+        items = self.parse_batch(batch)
+        self.load_authors(items)
+        rows = []
+        for number, item in items:
+            row, error = self.build_recipe(item)
+            if row is None:
+                self.skip(number, error)
+                continue
+            rows.append(row)
+        if not rows:
+            return 0
+
+        TagThrough = Recipe.tags.through
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [recipe for recipe, _, _ in rows])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id,
+                    amount=amount)
+                for recipe, (_, ingredients, _) in zip(recipes, rows)
+                for ingredient_id, amount in ingredients
+            )
+            change_ingredient_usage(
+                [ingredient_id for _, ingredients, _ in rows
+                 for ingredient_id, _ in ingredients], 1)
+            TagThrough.objects.bulk_create(
+                TagThrough(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe, (_, _, tags) in zip(recipes, rows)
+                for tag_id, _ in tags
+            )
+            self.after_create([recipe.id for recipe in recipes])
+        return len(recipes)
+
+    def after_create(self, recipe_ids):
+        """То, что при обычном создании делают сигналы и сериализатор.
+
+        bulk_create не шлёт post_save, поэтому события outbox, сброс
+        локальных кэшей и пересчёт похожих рецептов — здесь, по пачке.
+        """
+        record_events(RECIPE, Event.Action.CREATED, recipe_ids)
+        bump(CATALOG, *map(recipe_namespace, recipe_ids))
+        enqueue_on_commit(update_similar_recipes_batch, recipe_ids=recipe_ids)
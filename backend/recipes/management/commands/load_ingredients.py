@@ -2,6 +2,7 @@ import csv
 import os
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from foodgram import settings
 from recipes.models import Ingredient
@@ -21,7 +22,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         path = os.path.join(settings.BASE_DIR, 'ingredients.csv')
 
-        with open(path, 'r', encoding='utf-8') as file:
+        # Одна транзакция: кэши справочника сбросятся и прогреются
+        # один раз, а не после каждой строки.
+        with open(path, 'r', encoding='utf-8') as file, \
+                transaction.atomic():
             reader = csv.reader(file)
             next(reader)
             for row in reader:
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes.rankings import (TOP_SIZE, backfill_activity, compact_activity,
+                              rebuild_rankings, recount_favorites,
+                              recount_ingredient_usage)
+
+KEEP_DAYS = 30
+
+
+class Command(BaseCommand):
+    help = 'Compact recipe activity rollups and rebuild top rankings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=KEEP_DAYS,
+            help='Сколько последних дней хранить по отдельности')
+        parser.add_argument(
+            '--top', type=int, default=TOP_SIZE,
+            help='Размер каждого топа')
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='Пересоздать сводки из текущих избранного и корзин')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            backfill_activity()
+        compacted = compact_activity(options['keep_days'])
+        ranked = rebuild_rankings(options['top'])
+        recounted = recount_favorites()
+        usage = recount_ingredient_usage()
+        self.stdout.write(self.style.SUCCESS(
+            f'Свёрнуто записей: {compacted}, мест в рейтингах: {ranked}, '
+            f'исправлено счётчиков избранного: {recounted}, '
+            f'счётчиков ингредиентов: {usage}'))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, message='Должна быть хотя бы одна порция!'), django.core.validators.MaxValueValidator(100, message='Слишком много порций!')], verbose_name='Количество порций'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Пусто — столько, сколько указано в рецепте.', null=True, validators=[django.core.validators.MinValueValidator(1, message='Должна быть хотя бы одна порция!'), django.core.validators.MaxValueValidator(100, message='Слишком много порций!')], verbose_name='Сколько порций приготовить'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_servings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Удалённый рецепт скрыт и будет стёрт в фоне.', null=True, verbose_name='Дата удаления'),
+        ),
+    ]
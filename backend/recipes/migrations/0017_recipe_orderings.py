@@ -0,0 +1,46 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_favorites_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, favorites_count=total)
+            for recipe_id, total in Favorite.objects.values_list(
+                'recipe_id').annotate(Count('id')).order_by()
+        ],
+        ['favorites_count'],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_tag_bitmask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Счётчик для сортировки; сверяется при свёртке сводок.', verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_favorites_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['cooking_time', 'id'], name='recipe_cooking_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['name', 'id'], name='recipe_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-favorites_count', 'id'], name='recipe_favorites_count_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:37
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_usage_count(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    Ingredient.objects.bulk_update(
+        [
+            Ingredient(id=ingredient_id, usage_count=total)
+            for ingredient_id, total in RecipeIngredient.objects.values_list(
+                'ingredient_id').annotate(Count('id')).order_by()
+        ],
+        ['usage_count'],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_orderings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Счётчик для ранжирования поиска; сверяется при свёртке сводок.', verbose_name='Используется в рецептах'),
+        ),
+        migrations.RunPython(fill_usage_count, migrations.RunPython.noop),
+    ]
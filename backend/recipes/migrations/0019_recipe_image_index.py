@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_ingredient_usage_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, upload_to='recipes/', verbose_name='Изображение рецепта'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # istartswith сравнивает UPPER(name): индекс по самому name ему
+    # не подходит.
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS ingredient_name_upper_trgm '
+        'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+def drop_upper_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_recipe_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_upper_trigram_index, drop_upper_trigram_index),
+    ]
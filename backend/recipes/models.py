@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 User = get_user_model()
 
@@ -14,6 +15,22 @@ MEASUREMENT_UNIT_MAX_LENGTH = 200
 MIN_VALUE = 1
 MAX_COOKING_TIME = 32_000
 MAX_AMOUNT = 32_000
+MAX_SERVINGS = 100
+# Биты маски тегов в BigIntegerField; знаковый бит не используем.
+MAX_TAGS = 63
+
+
+# Сортировки ленты рецептов: значение ?ordering= -> поля order_by.
+RECIPE_ORDERINGS = {
+    'cooking_time': ('cooking_time', 'id'),
+    'name': ('name', 'id'),
+    '-favorites_count': ('-favorites_count', 'id'),
+}
+
+
+def tag_mask(bits):
+    """Маска тегов рецепта по номерам их битов."""
+    return sum(1 << bit for bit in set(bits))
 
 
 class Ingredient(models.Model):
@@ -28,6 +45,13 @@ class Ingredient(models.Model):
         max_length=MEASUREMENT_UNIT_MAX_LENGTH,
         verbose_name='Единицы измерения'
     )
+    usage_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Счётчик для ранжирования поиска; сверяется при '
+                  'свёртке сводок.',
+        verbose_name='Используется в рецептах'
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -51,6 +75,12 @@ class Tag(models.Model):
         unique=True,
         verbose_name='Уникальный слаг'
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name='Бит в маске тегов',
+        help_text='Назначается автоматически при создании тега.'
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -65,6 +95,42 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @staticmethod
+    def free_bit():
+        used = set(Tag.objects.values_list('bit', flat=True))
+        for bit in range(MAX_TAGS):
+            if bit not in used:
+                return bit
+        raise ValidationError(f'Тегов не может быть больше {MAX_TAGS}.')
+
+    def save(self, *args, **kwargs):
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        # Параллельно созданный тег может занять тот же бит: уникальность
+        # bit отклонит вставку, и берётся следующий свободный бит.
+        for _ in range(MAX_TAGS):
+            self.bit = self.free_bit()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Tag.objects.filter(bit=self.bit).exists()
+                self.bit = None
+                if not taken:
+                    raise
+        raise ValidationError(f'Тегов не может быть больше {MAX_TAGS}.')
+
+
+class RecipeManager(models.Manager):
+    """Рецепты без отметки об удалении."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Recipe(models.Model):
     """Модель рецептов."""
@@ -83,7 +149,8 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/',
         verbose_name='Изображение рецепта',
-        blank=True
+        blank=True,
+        db_index=True
     )
     name = models.CharField(
         max_length=RECIPE_NAME_MAX_LENGTH,
@@ -102,6 +169,17 @@ class Recipe(models.Model):
             MaxValueValidator(MAX_COOKING_TIME, message='Слишком долго!')
         ]
     )
+    servings = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='Количество порций',
+        validators=[
+            MinValueValidator(
+                MIN_VALUE,
+                message='Должна быть хотя бы одна порция!'
+            ),
+            MaxValueValidator(MAX_SERVINGS, message='Слишком много порций!')
+        ]
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -112,16 +190,81 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата удаления',
+        help_text='Удалённый рецепт скрыт и будет стёрт в фоне.'
+    )
+    tag_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тегов',
+        help_text='Биты тегов рецепта; поддерживается сигналами.'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Счётчик для сортировки; сверяется при свёртке сводок.'
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            # Лента идёт по индексу до заполнения страницы. Условие на
+            # маску тегов btree не проверяет — это фильтр по строкам.
+            models.Index(fields=['-created'],
+                         name='recipe_created_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            # По индексу на каждую сортировку ленты (RECIPE_ORDERINGS):
+            # страница читается из индекса без сортировки всей таблицы.
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            models.Index(fields=['name', 'id'],
+                         name='recipe_name_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            models.Index(fields=['-favorites_count', 'id'],
+                         name='recipe_favorites_count_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeTombstone(models.Model):
+    """Отметка об удалённом рецепте для синхронизации клиентов."""
+
+    recipe_id = models.BigIntegerField(
+        verbose_name='Id рецепта'
+    )
+    deleted = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id} удалён {self.deleted}'
+
+
 class RecipeIngredient(models.Model):
     """Модель для связи рецептов и ингредиентов с указанием количества."""
 
@@ -206,6 +349,19 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Рецепт'
     )
+    servings = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Сколько порций приготовить',
+        help_text='Пусто — столько, сколько указано в рецепте.',
+        validators=[
+            MinValueValidator(
+                MIN_VALUE,
+                message='Должна быть хотя бы одна порция!'
+            ),
+            MaxValueValidator(MAX_SERVINGS, message='Слишком много порций!')
+        ]
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -249,3 +405,171 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class RecipeActivity(models.Model):
+    """Дневная сводка добавлений рецепта в избранное и списки покупок.
+
+    Хранит чистое изменение за день: удаление вычитает единицу.
+    Старые дни сворачиваются в одну архивную запись.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт'
+    )
+    day = models.DateField(
+        verbose_name='День'
+    )
+    favorites = models.IntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное'
+    )
+    shopping_carts = models.IntegerField(
+        default=0,
+        verbose_name='Добавлений в список покупок'
+    )
+
+    class Meta:
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'day'],
+                name='unique_recipe_activity_day'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='recipe_activity_day')
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} за {self.day}'
+
+
+class RecipeRanking(models.Model):
+    """Предрассчитанный топ рецептов для сортировки списка."""
+
+    class Kind(models.TextChoices):
+        TRENDING = 'trending', 'Популярные за неделю'
+        POPULAR = 'popular', 'Самые избранные'
+
+    kind = models.CharField(
+        max_length=max(len(value) for value in Kind.values),
+        choices=Kind.choices,
+        verbose_name='Рейтинг'
+    )
+    rank = models.PositiveIntegerField(
+        verbose_name='Место'
+    )
+    score = models.IntegerField(
+        verbose_name='Очки'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='rankings',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        verbose_name = 'Место в рейтинге'
+        verbose_name_plural = 'Рейтинги рецептов'
+        ordering = ('kind', 'rank')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'rank'],
+                name='unique_recipe_ranking_rank'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.rank}. {self.recipe_id}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура набора ингредиентов рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт'
+    )
+    signature = models.BinaryField(
+        verbose_name='Сигнатура'
+    )
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура {self.recipe_id}'
+
+
+class RecipeBand(models.Model):
+    """Корзина LSH, в которую рецепт попал по одной из полос сигнатуры."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name='Рецепт'
+    )
+    band = models.PositiveSmallIntegerField(
+        verbose_name='Полоса'
+    )
+    bucket = models.BigIntegerField(
+        verbose_name='Корзина'
+    )
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'],
+                name='recipe_band_bucket'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}/{self.bucket}'
+
+
+class RecipeNeighbour(models.Model):
+    """Похожий рецепт с оценкой сходства по Жаккару."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт'
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbour_of',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('-score',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbour'],
+                name='unique_recipe_neighbour'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.neighbour_id} ({self.score:.2f})'
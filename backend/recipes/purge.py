@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from events.models import Event
+from events.outbox import (FAVORITE, FOLLOW, RECIPE, SHOPPING_CART,
+                           record_events)
+from foodgram.versions import bump, recipe_namespace, user_namespace
+from jobs.queue import enqueue_on_commit
+from jobs.tasks import delete_media_file
+from recipes.models import (Favorite, Follow, Recipe, RecipeIngredient,
+                            RecipeTombstone, ShoppingCart)
+from recipes.rankings import change_ingredient_usage
+from recipes.tasks import (purge_deleted_recipe, purge_deleted_user,
+                           repair_favorite_counts)
+from users.models import DELETED_PLACEHOLDER
+
+User = get_user_model()
+
+PURGE_BATCH_SIZE = 500
+
+# Связи, об удалении которых пишутся события: тема и поле объекта
+# события, как в API.
+LINK_EVENTS = {
+    Favorite: (FAVORITE, 'recipe_id'),
+    ShoppingCart: (SHOPPING_CART, 'recipe_id'),
+    Follow: (FOLLOW, 'author_id'),
+}
+
+
+def cascade_relations(model):
+    """Связи, строки которых удаляются вместе с объектом model.
+
+    Включает скрытые связи, например промежуточную таблицу тегов.
+    """
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_many or field.one_to_one)
+        and field.on_delete is models.CASCADE
+    ]
+
+
+def _delete_links(model, ids):
+    """Удаляет связи и пишет о них события в той же транзакции."""
+    topic, field = LINK_EVENTS[model]
+    with transaction.atomic():
+        rows = list(model._base_manager.filter(pk__in=ids).values_list(
+            field, 'user_id'))
+        deleted = model._base_manager.filter(pk__in=ids).delete()[0]
+        record_events(
+            topic, Event.Action.DELETED,
+            [object_id for object_id, _ in rows],
+            [{'user': user_id} for _, user_id in rows]
+        )
+    return deleted
+
+
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет строки пачками, каждая — в своей короткой транзакции."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        if model in LINK_EVENTS:
+            deleted += _delete_links(model, ids)
+        else:
+            deleted += model._base_manager.filter(pk__in=ids).delete()[0]
+
+
+def purge_related(instance, batch_size=PURGE_BATCH_SIZE, skip=()):
+    """Стирает зависимые строки объекта пачками, а затем и сам объект."""
+    for relation in cascade_relations(type(instance)):
+        if relation.related_model in skip:
+            continue
+        delete_in_batches(
+            relation.related_model._base_manager.filter(
+                **{relation.field.name: instance.pk}),
+            batch_size
+        )
+    # Зависимых строк уже нет, каскад ничего не найдёт. Сигнал
+    # post_delete поставит удаление файлов в очередь.
+    instance.delete()
+
+
+def purge_recipe(recipe_id, batch_size=PURGE_BATCH_SIZE):
+    recipe = Recipe.all_objects.filter(
+        pk=recipe_id, deleted_at__isnull=False).first()
+    if recipe is None:
+        return
+    # Связи стираются пачками; если очистка прервётся, счётчики
+    # выправит свёртка сводок.
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    purge_related(recipe, batch_size)
+    change_ingredient_usage(ingredient_ids, -1)
+
+
+def purge_user(user_id, batch_size=PURGE_BATCH_SIZE):
+    user = User.all_objects.filter(
+        pk=user_id, deleted_at__isnull=False).first()
+    if user is None:
+        return
+    for recipe_id in Recipe.all_objects.filter(
+        author_id=user_id
+    ).values_list('pk', flat=True).iterator():
+        purge_recipe(recipe_id, batch_size)
+    favorited = list(
+        user.favorites.values_list('recipe_id', flat=True).distinct())
+    purge_related(user, batch_size, skip=(Recipe,))
+    if favorited:
+        enqueue_on_commit(repair_favorite_counts, recipe_ids=favorited)
+    if user.avatar:
+        enqueue_on_commit(delete_media_file, name=user.avatar.name)
+
+
+def _hide_recipes(recipe_ids, now):
+    Recipe.objects.filter(pk__in=recipe_ids).update(deleted_at=now)
+    RecipeTombstone.objects.bulk_create(
+        RecipeTombstone(recipe_id=recipe_id) for recipe_id in recipe_ids)
+    record_events(RECIPE, Event.Action.DELETED, recipe_ids)
+    bump(*map(recipe_namespace, recipe_ids))
+
+
+def soft_delete_recipes(recipe_ids):
+    """Сразу скрывает рецепты отовсюду, а стирает их в фоне."""
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic():
+        _hide_recipes(recipe_ids, timezone.now())
+        for recipe_id in recipe_ids:
+            enqueue_on_commit(purge_deleted_recipe, recipe_id=recipe_id)
+
+
+def soft_delete_user(user):
+    """Скрывает пользователя и его рецепты, сессии по токену закрывает.
+
+    Логин и почта сразу освобождаются, чтобы с ними можно было снова
+    зарегистрироваться. Строки пользователя и его рецептов стираются
+    в фоне.
+    """
+    now = timezone.now()
+    placeholder = DELETED_PLACEHOLDER.format(user.pk)
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            deleted_at=now, is_active=False,
+            username=placeholder, email=placeholder)
+        bump(user_namespace(user.pk))
+        _hide_recipes(
+            list(Recipe.objects.filter(
+                author_id=user.pk).values_list('pk', flat=True)),
+            now
+        )
+        # Удаление по одному: сигналы сбрасывают кэш токенов.
+        for token in Token.objects.filter(user_id=user.pk):
+            token.delete()
+        enqueue_on_commit(purge_deleted_user, user_id=user.pk)
@@ -0,0 +1,194 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeActivity,
+                            RecipeIngredient, RecipeRanking, ShoppingCart)
+
+# День архивной записи, в которую сворачиваются старые сводки.
+ARCHIVE_DAY = date(1970, 1, 1)
+TRENDING_DAYS = 7
+TOP_SIZE = 100
+FAVORITE_WEIGHT = 2
+SHOPPING_CART_WEIGHT = 1
+BATCH_SIZE = 1000
+# Сверка счётчиков идёт диапазонами pk: каждый UPDATE короткий.
+RECOUNT_BATCH_SIZE = 5000
+
+ACTIVITY_FIELDS = {
+    Favorite: 'favorites',
+    ShoppingCart: 'shopping_carts',
+}
+
+
+def _add_to_bucket(recipe_id, day, deltas):
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    return RecipeActivity.objects.filter(
+        recipe_id=recipe_id, day=day).update(**increments)
+
+
+def record_activity(recipe_id, model, delta):
+    """Учитывает добавление (+1) или удаление (-1) в сводке за сегодня."""
+    deltas = {ACTIVITY_FIELDS[model]: delta}
+    day = timezone.localdate()
+    if _add_to_bucket(recipe_id, day, deltas):
+        return
+    try:
+        with transaction.atomic():
+            RecipeActivity.objects.create(
+                recipe_id=recipe_id, day=day, **deltas)
+    except IntegrityError:
+        _add_to_bucket(recipe_id, day, deltas)
+
+
+def _merge_into_archive(totals):
+    """Прибавляет суммы по рецептам к их архивным записям."""
+    totals = {row['recipe_id']: row for row in totals}
+    archive = RecipeActivity.objects.filter(
+        day=ARCHIVE_DAY, recipe_id__in=totals.keys())
+    existing = []
+    for bucket in archive:
+        row = totals.pop(bucket.recipe_id)
+        bucket.favorites += row['favorites']
+        bucket.shopping_carts += row['shopping_carts']
+        existing.append(bucket)
+    RecipeActivity.objects.bulk_update(
+        existing, ('favorites', 'shopping_carts'), batch_size=BATCH_SIZE)
+    RecipeActivity.objects.bulk_create(
+        (RecipeActivity(day=ARCHIVE_DAY, **row) for row in totals.values()),
+        batch_size=BATCH_SIZE)
+
+
+def compact_activity(keep_days):
+    """Сворачивает сводки старше keep_days дней в архивные записи."""
+    cutoff = timezone.localdate() - timedelta(days=keep_days)
+    old = RecipeActivity.objects.filter(day__gt=ARCHIVE_DAY, day__lt=cutoff)
+    with transaction.atomic():
+        _merge_into_archive(
+            old.values('recipe_id').annotate(
+                favorites=Sum('favorites'),
+                shopping_carts=Sum('shopping_carts'),
+            ).order_by()
+        )
+        return old.delete()[0]
+
+
+def backfill_activity():
+    """Пересоздаёт сводки по текущему содержимому избранного и корзин."""
+    favorites = dict(
+        Favorite.objects.values_list('recipe_id').annotate(Count('id')))
+    carts = dict(
+        ShoppingCart.objects.values_list('recipe_id').annotate(Count('id')))
+    with transaction.atomic():
+        RecipeActivity.objects.all().delete()
+        RecipeActivity.objects.bulk_create(
+            (
+                RecipeActivity(
+                    recipe_id=recipe_id, day=ARCHIVE_DAY,
+                    favorites=favorites.get(recipe_id, 0),
+                    shopping_carts=carts.get(recipe_id, 0))
+                for recipe_id in favorites.keys() | carts.keys()
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+
+def rebuild_rankings(top_size=TOP_SIZE):
+    """Пересчитывает топы «популярное за неделю» и «самое избранное»."""
+    since = timezone.localdate() - timedelta(days=TRENDING_DAYS - 1)
+    scores = {
+        RecipeRanking.Kind.TRENDING: RecipeActivity.objects.filter(
+            day__gte=since
+        ).values('recipe_id').annotate(score=Sum(
+            F('favorites') * FAVORITE_WEIGHT
+            + F('shopping_carts') * SHOPPING_CART_WEIGHT
+        )),
+        RecipeRanking.Kind.POPULAR: RecipeActivity.objects.values(
+            'recipe_id').annotate(score=Sum('favorites')),
+    }
+    rankings = [
+        RecipeRanking(
+            kind=kind, rank=rank, score=row['score'],
+            recipe_id=row['recipe_id'])
+        for kind, queryset in scores.items()
+        for rank, row in enumerate(
+            queryset.filter(score__gt=0).order_by('-score', 'recipe_id')[
+                :top_size],
+            start=1
+        )
+    ]
+    with transaction.atomic():
+        RecipeRanking.objects.all().delete()
+        RecipeRanking.objects.bulk_create(rankings)
+    return len(rankings)
+
+
+def pk_ranges(queryset, batch_size=RECOUNT_BATCH_SIZE):
+    """Полуоткрытые диапазоны pk по batch_size, покрывающие queryset."""
+    bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        yield start, start + batch_size
+
+
+def _recount(queryset, field, actual, ids, batch_size):
+    """Исправляет field там, где он разошёлся с actual.
+
+    Без списка ids сверка идёт диапазонами pk, каждый своим запросом:
+    строки всей таблицы не блокируются одной транзакцией.
+    """
+    def fix(rows):
+        return rows.alias(actual=actual).exclude(
+            **{field: F('actual')}).update(**{field: actual})
+
+    if ids is not None:
+        return fix(queryset.filter(pk__in=ids))
+    return sum(
+        fix(queryset.filter(pk__gte=start, pk__lt=stop))
+        for start, stop in pk_ranges(queryset, batch_size)
+    )
+
+
+def recount_favorites(recipe_ids=None, batch_size=RECOUNT_BATCH_SIZE):
+    """Сверяет счётчики избранного у рецептов с таблицей избранного.
+
+    Счётчик меняется вместе с избранным в API, но удаления из админки
+    и фоновая очистка его не трогают — здесь расхождения исправляются.
+    recipe_ids ограничивает сверку указанными рецептами.
+    """
+    actual = Coalesce(Subquery(
+        Favorite.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(total=Count('id')).values('total')
+    ), 0)
+    return _recount(Recipe.all_objects.all(), 'favorites_count', actual,
+                    recipe_ids, batch_size)
+
+
+def change_ingredient_usage(ingredient_ids, delta):
+    """Сдвигает счётчики использования на delta за каждое вхождение id.
+
+    Ингредиенты с одинаковым сдвигом обновляются одним запросом.
+    """
+    groups = defaultdict(list)
+    for ingredient_id, times in Counter(ingredient_ids).items():
+        groups[times * delta].append(ingredient_id)
+    for change, ids in groups.items():
+        Ingredient.objects.filter(pk__in=sorted(ids)).update(
+            usage_count=Greatest(F('usage_count') + change, 0))
+
+
+def recount_ingredient_usage(batch_size=RECOUNT_BATCH_SIZE):
+    """Сверяет счётчики использования ингредиентов со связями рецептов."""
+    actual = Coalesce(Subquery(
+        RecipeIngredient.objects.filter(
+            ingredient=OuterRef('pk')
+        ).order_by().values('ingredient').annotate(
+            total=Count('id')).values('total')
+    ), 0)
+    return _recount(Ingredient.objects.all(), 'usage_count', actual,
+                    None, batch_size)
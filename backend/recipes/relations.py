@@ -0,0 +1,42 @@
+from django.db import connections, router
+
+
+def link_once(model, target, target_id, **values):
+    """Создаёт связь одним запросом, если её ещё нет.
+
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING: строка
+    вставляется, только если объект target с id target_id виден через
+    менеджер по умолчанию (существует и не удалён) и уникальное
+    ограничение не нарушено. Одновременные запросы не падают
+    с IntegrityError — лишний просто ничего не вставит.
+    Возвращает True, если связь создана.
+    """
+    opts = model._meta
+    target_field = opts.get_field(target)
+    target_model = target_field.related_model
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+
+    fields = [opts.get_field(name) for name in values]
+    params = [
+        field.get_db_prep_save(getattr(value, 'pk', value), connection)
+        for field, value in zip(fields, values.values())
+    ]
+    source, source_params = target_model._default_manager.filter(
+        pk=target_id
+    ).order_by().values('pk').query.get_compiler(
+        connection=connection).as_sql()
+    columns = ', '.join(
+        quote(field.column) for field in fields + [target_field])
+    placeholders = ''.join('%s, ' for _ in fields)
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} ({columns}) '
+        f'SELECT {placeholders}source.{quote(target_model._meta.pk.column)} '
+        f'FROM ({source}) source '
+        # Без WHERE SQLite примет ON CONFLICT за условие соединения.
+        'WHERE 1 = 1 '
+        f'ON CONFLICT DO NOTHING RETURNING {quote(opts.pk.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + list(source_params))
+        return cursor.fetchone() is not None
@@ -0,0 +1,138 @@
+import re
+import time
+from collections import defaultdict
+from threading import Lock
+
+import numpy as np
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Ln
+
+from foodgram.versions import CATALOG, VersionedCache
+from recipes.models import Ingredient
+
+SEARCH_LIMIT = 50
+# Как в pg_trgm: pg_trgm.similarity_threshold по умолчанию.
+SIMILARITY_THRESHOLD = 0.3
+PREFIX_WEIGHT = 0.5
+POPULARITY_WEIGHT = 0.05
+INDEX_TTL = 600
+
+WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Триграммы строки по правилам pg_trgm."""
+    result = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class TrigramIndex:
+    """Инвертированный индекс триграмм по названиям ингредиентов."""
+
+    def __init__(self, rows):
+        ids, names, usage = zip(*rows) if rows else ((), (), ())
+        self.ids = np.array(ids, dtype=np.int64)
+        self.names = np.array([name.lower() for name in names], dtype=str)
+        self.popularity = POPULARITY_WEIGHT * np.log1p(
+            np.array(usage, dtype=np.float64))
+        postings = defaultdict(list)
+        sizes = []
+        for position, name in enumerate(self.names):
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(position)
+        self.sizes = np.array(sizes, dtype=np.float64)
+        self.postings = {
+            gram: np.array(positions, dtype=np.intp)
+            for gram, positions in postings.items()
+        }
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Id ингредиентов, упорядоченные по убыванию релевантности.
+
+        limit=None — все подходящие.
+        """
+        grams = trigrams(query)
+        if not grams or not len(self.ids):
+            return []
+        shared = np.zeros(len(self.ids), dtype=np.float64)
+        for gram in grams:
+            positions = self.postings.get(gram)
+            if positions is not None:
+                shared[positions] += 1
+        similarity = shared / (len(grams) + self.sizes - shared)
+        prefix = np.char.startswith(self.names, query)
+        candidates = np.flatnonzero(
+            (similarity >= SIMILARITY_THRESHOLD) | prefix)
+        score = (
+            similarity[candidates] + PREFIX_WEIGHT * prefix[candidates]
+            + self.popularity[candidates]
+        )
+        order = np.argsort(-score, kind='stable')[:limit]
+        return self.ids[candidates[order]].tolist()
+
+
+_indexes = VersionedCache(maxsize=1)
+_index_lock = Lock()
+
+
+def _build_index():
+    return time.monotonic(), TrigramIndex(list(
+        Ingredient.objects.values_list(
+            'id', 'name', 'usage_count').order_by()
+    ))
+
+
+def get_index():
+    """Индекс процесса; перестраивается по TTL или после смены справочника.
+
+    Справочник мог измениться в другом процессе — об этом говорит
+    версия пространства catalog.
+    """
+    with _index_lock:
+        built, index = _indexes.get_or_set('index', (CATALOG,), _build_index)
+        if time.monotonic() - built > INDEX_TTL:
+            versions = _indexes.current((CATALOG,))
+            built, index = _build_index()
+            _indexes.set('index', (CATALOG,), (built, index), versions)
+        return index
+
+
+def search_ingredients(queryset, query):
+    """Нечёткий поиск ингредиентов с ранжированием.
+
+    Учитывает сходство по триграммам, совпадение начала названия
+    и то, как часто ингредиент встречается в рецептах. Queryset не
+    срезается, чтобы по нему можно было искать объект; ограничивает
+    выдачу список.
+    """
+    query = query.strip().lower()
+    if connections[queryset.db].vendor == 'postgresql':
+        # UPPER(name) LIKE обслуживает индекс ingredient_name_upper_trgm.
+        return queryset.filter(
+            Q(name__trigram_similar=query) | Q(name__istartswith=query)
+        ).annotate(
+            score=TrigramSimilarity('name', query)
+            + Case(
+                When(name__istartswith=query, then=Value(PREFIX_WEIGHT)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            + POPULARITY_WEIGHT * Ln(
+                Cast('usage_count', FloatField()) + Value(1.0))
+        ).order_by('-score', 'name')
+
+    ids = get_index().search(query, limit=None)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(Case(
+        *(When(id=pk, then=Value(position))
+          for position, pk in enumerate(ids)),
+        default=Value(len(ids)),
+    ))
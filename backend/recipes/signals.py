@@ -0,0 +1,102 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from events.models import Event
+from events.outbox import RECIPE, record_event, record_events
+from foodgram.versions import CATALOG, bump, recipe_namespace
+from jobs.queue import enqueue_on_commit
+from jobs.tasks import delete_media_file
+from recipes.models import (Ingredient, Recipe, RecipeTombstone, Tag,
+                            tag_mask)
+
+
+def touch_recipes(recipe_ids):
+    """Отмечает рецепты изменёнными без загрузки из базы."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated=timezone.now())
+    record_events(RECIPE, Event.Action.UPDATED, recipe_ids)
+    bump(*map(recipe_namespace, recipe_ids))
+
+
+def _update_tag_masks(recipes, mask):
+    recipes.update(tag_mask=mask, updated=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение тегов считается изменением рецепта.
+
+    Заодно поддерживается маска тегов: биты добавленных тегов
+    выставляются, удалённых — сбрасываются одним UPDATE.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipes = Recipe.all_objects.filter(pk=instance.pk)
+        bits = tag_mask(Tag.objects.filter(
+            pk__in=pk_set or ()).values_list('bit', flat=True))
+    else:
+        recipes = Recipe.all_objects.all()
+        if pk_set:
+            recipes = recipes.filter(pk__in=pk_set)
+        bits = instance.mask
+
+    if action == 'post_add':
+        _update_tag_masks(recipes, F('tag_mask').bitor(bits))
+    elif action == 'post_remove':
+        _update_tag_masks(recipes, F('tag_mask').bitand(~bits))
+    elif not reverse:
+        _update_tag_masks(recipes, 0)
+    else:
+        _update_tag_masks(
+            recipes.alias(tag_bit=F('tag_mask').bitand(bits)).filter(
+                tag_bit__gt=0),
+            F('tag_mask').bitand(~bits)
+        )
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Связи с рецептами удаляются каскадом без m2m_changed."""
+    bump(CATALOG)
+    _update_tag_masks(
+        Recipe.all_objects.alias(
+            tag_bit=F('tag_mask').bitand(instance.mask)
+        ).filter(tag_bit__gt=0),
+        F('tag_mask').bitand(~instance.mask)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """Событие outbox о создании или изменении рецепта."""
+    if not created:
+        bump(recipe_namespace(instance.pk))
+    record_event(
+        RECIPE,
+        Event.Action.CREATED if created else Event.Action.UPDATED,
+        instance.pk,
+        author=instance.author_id,
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Оставляет отметку, чтобы клиенты узнали об удалении.
+
+    У мягко удалённых рецептов отметка уже есть. Картинка удаляется
+    в фоне, если на неё больше никто не ссылается.
+    """
+    if instance.deleted_at is None:
+        RecipeTombstone.objects.create(recipe_id=instance.pk)
+    if instance.image:
+        enqueue_on_commit(delete_media_file, name=instance.image.name)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Справочник изменился — локальные кэши процессов устарели."""
+    bump(CATALOG)
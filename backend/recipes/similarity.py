@@ -0,0 +1,239 @@
+from functools import reduce
+from itertools import groupby
+from operator import itemgetter, or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import (RecipeBand, RecipeIngredient, RecipeNeighbour,
+                            RecipeSignature)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+TOP_K = 10
+MIN_SCORE = 0.2
+# Слишком большие корзины дают квадратичное число пар — обрезаем.
+MAX_BUCKET_SIZE = 100
+BATCH_SIZE = 10_000
+SCORE_CHUNK = 100_000
+MERSENNE_PRIME = (1 << 31) - 1
+SEED = 20250310
+
+_random = np.random.default_rng(SEED)
+HASH_A = _random.integers(1, MERSENNE_PRIME, NUM_PERM, dtype=np.int64)
+HASH_B = _random.integers(0, MERSENNE_PRIME, NUM_PERM, dtype=np.int64)
+BAND_WEIGHTS = _random.integers(
+    1, np.iinfo(np.int64).max, ROWS, dtype=np.int64).astype(np.uint64)
+
+
+def minhash(recipe_ids, ingredient_ids):
+    """MinHash-сигнатуры рецептов.
+
+    Принимает массивы пар (рецепт, ингредиент), упорядоченные по рецепту.
+    Возвращает id рецептов и матрицу сигнатур (рецептов × NUM_PERM).
+    """
+    hashes = (
+        np.outer(ingredient_ids % MERSENNE_PRIME, HASH_A) + HASH_B
+    ) % MERSENNE_PRIME
+    starts = np.flatnonzero(
+        np.r_[True, recipe_ids[1:] != recipe_ids[:-1]])
+    signatures = np.minimum.reduceat(hashes, starts, axis=0)
+    return recipe_ids[starts], signatures.astype(np.uint32)
+
+
+def band_buckets(signatures):
+    """Ключи корзин LSH: по одному на каждую полосу сигнатуры."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS)
+    keys = (bands.astype(np.uint64) * BAND_WEIGHTS).sum(axis=2)
+    return keys.view(np.int64)
+
+
+def jaccard(signatures, other):
+    """Оценка сходства по Жаккару — доля совпавших позиций сигнатур."""
+    return (signatures == other).mean(axis=-1)
+
+
+def candidate_pairs(buckets):
+    """Пары рецептов, совпавших хотя бы в одной полосе."""
+    pairs = []
+    for band in range(BANDS):
+        order = np.argsort(buckets[:, band], kind='stable')
+        keys = buckets[order, band]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            members = order[start:min(end, start + MAX_BUCKET_SIZE)]
+            first, second = np.triu_indices(len(members), k=1)
+            pairs.append(np.stack([members[first], members[second]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.intp)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def top_neighbours(pairs, scores, top_k=TOP_K):
+    """Оставляет для каждого рецепта top_k самых похожих соседей."""
+    keep = scores >= MIN_SCORE
+    pairs, scores = pairs[keep], scores[keep]
+    source = np.r_[pairs[:, 0], pairs[:, 1]]
+    target = np.r_[pairs[:, 1], pairs[:, 0]]
+    scores = np.r_[scores, scores]
+    order = np.lexsort((-scores, source))
+    source, target, scores = source[order], target[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+    sizes = np.diff(np.r_[starts, len(source)])
+    rank = np.arange(len(source)) - np.repeat(starts, sizes)
+    keep = rank < top_k
+    return source[keep], target[keep], scores[keep]
+
+
+def _signature_batches(batch_size):
+    """Потоково считает сигнатуры, не разрывая рецепт между пачками."""
+    rows = RecipeIngredient.objects.order_by('recipe_id').values_list(
+        'recipe_id', 'ingredient_id').iterator(chunk_size=batch_size)
+    recipe_ids, ingredient_ids = [], []
+    for recipe_id, group in groupby(rows, key=itemgetter(0)):
+        for _, ingredient_id in group:
+            recipe_ids.append(recipe_id)
+            ingredient_ids.append(ingredient_id)
+        if len(recipe_ids) >= batch_size:
+            yield minhash(np.array(recipe_ids), np.array(ingredient_ids))
+            recipe_ids, ingredient_ids = [], []
+    if recipe_ids:
+        yield minhash(np.array(recipe_ids), np.array(ingredient_ids))
+
+
+def _band_rows(recipe_ids, buckets):
+    return (
+        RecipeBand(recipe_id=recipe_id, band=band, bucket=bucket)
+        for recipe_id, row in zip(recipe_ids.tolist(), buckets.tolist())
+        for band, bucket in enumerate(row)
+    )
+
+
+def build_similarity_index(top_k=TOP_K, batch_size=BATCH_SIZE):
+    """Полностью перестраивает сигнатуры, корзины LSH и списки соседей."""
+    all_ids, all_signatures = [], []
+    with transaction.atomic():
+        RecipeNeighbour.objects.all().delete()
+        RecipeBand.objects.all().delete()
+        RecipeSignature.objects.all().delete()
+        for recipe_ids, signatures in _signature_batches(batch_size):
+            RecipeSignature.objects.bulk_create(
+                (
+                    RecipeSignature(recipe_id=recipe_id,
+                                    signature=signature.tobytes())
+                    for recipe_id, signature in zip(recipe_ids.tolist(),
+                                                    signatures)
+                ),
+                batch_size=batch_size
+            )
+            RecipeBand.objects.bulk_create(
+                _band_rows(recipe_ids, band_buckets(signatures)),
+                batch_size=batch_size
+            )
+            all_ids.append(recipe_ids)
+            all_signatures.append(signatures)
+
+        if not all_ids:
+            return 0
+        recipe_ids = np.concatenate(all_ids)
+        signatures = np.concatenate(all_signatures)
+        pairs = candidate_pairs(band_buckets(signatures))
+        scores = np.concatenate([
+            jaccard(signatures[chunk[:, 0]], signatures[chunk[:, 1]])
+            for chunk in np.array_split(
+                pairs, max(1, len(pairs) // SCORE_CHUNK))
+        ]) if len(pairs) else np.empty(0)
+        source, target, scores = top_neighbours(pairs, scores, top_k)
+        RecipeNeighbour.objects.bulk_create(
+            (
+                RecipeNeighbour(recipe_id=recipe_id, neighbour_id=neighbour_id,
+                                score=score)
+                for recipe_id, neighbour_id, score in zip(
+                    recipe_ids[source].tolist(), recipe_ids[target].tolist(),
+                    scores.tolist())
+            ),
+            batch_size=batch_size
+        )
+    return len(source)
+
+
+def _trim_neighbours(recipe_ids, top_k):
+    """Удаляет у рецептов соседей сверх top_k."""
+    extra, seen = [], {}
+    for pk, recipe_id in RecipeNeighbour.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('recipe_id', '-score').values_list('id', 'recipe_id'):
+        seen[recipe_id] = seen.get(recipe_id, 0) + 1
+        if seen[recipe_id] > top_k:
+            extra.append(pk)
+    RecipeNeighbour.objects.filter(id__in=extra).delete()
+
+
+def update_recipe_similarity(recipe_id, top_k=TOP_K):
+    """Обновляет индекс для одного рецепта без полной перестройки.
+
+    Кандидаты берутся из общих корзин LSH; рецепт получает своих
+    соседей и добавляется в списки соседей кандидатов.
+    """
+    ingredient_ids = np.array(
+        list(RecipeIngredient.objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', flat=True)),
+        dtype=np.int64
+    )
+    with transaction.atomic():
+        RecipeBand.objects.filter(recipe_id=recipe_id).delete()
+        RecipeNeighbour.objects.filter(
+            Q(recipe_id=recipe_id) | Q(neighbour_id=recipe_id)).delete()
+        if not len(ingredient_ids):
+            RecipeSignature.objects.filter(recipe_id=recipe_id).delete()
+            return 0
+
+        _, signatures = minhash(
+            np.full(len(ingredient_ids), recipe_id), ingredient_ids)
+        buckets = band_buckets(signatures)
+        RecipeSignature.objects.update_or_create(
+            recipe_id=recipe_id,
+            defaults={'signature': signatures[0].tobytes()}
+        )
+        RecipeBand.objects.bulk_create(
+            _band_rows(np.array([recipe_id]), buckets))
+
+        candidates = RecipeBand.objects.filter(reduce(or_, (
+            Q(band=band, bucket=bucket)
+            for band, bucket in enumerate(buckets[0].tolist())
+        ))).exclude(recipe_id=recipe_id).values('recipe_id')[
+            :MAX_BUCKET_SIZE * BANDS]
+        rows = list(RecipeSignature.objects.filter(
+            recipe_id__in=candidates).values_list('recipe_id', 'signature'))
+        if not rows:
+            return 0
+        candidate_ids = np.array([pk for pk, _ in rows])
+        candidate_signatures = np.stack([
+            np.frombuffer(bytes(signature), dtype=np.uint32)
+            for _, signature in rows
+        ])
+        scores = jaccard(candidate_signatures, signatures[0])
+        order = np.argsort(-scores, kind='stable')
+        order = order[scores[order] >= MIN_SCORE]
+
+        forward = [
+            RecipeNeighbour(recipe_id=recipe_id, neighbour_id=neighbour_id,
+                            score=score)
+            for neighbour_id, score in zip(
+                candidate_ids[order[:top_k]].tolist(),
+                scores[order[:top_k]].tolist())
+        ]
+        backward = [
+            RecipeNeighbour(recipe_id=neighbour_id, neighbour_id=recipe_id,
+                            score=score)
+            for neighbour_id, score in zip(
+                candidate_ids[order].tolist(), scores[order].tolist())
+        ]
+        RecipeNeighbour.objects.bulk_create(forward + backward)
+        _trim_neighbours(candidate_ids[order].tolist(), top_k)
+    return len(forward)
@@ -0,0 +1,40 @@
+from jobs.queue import task
+
+
+@task()
+def update_similar_recipes(recipe_id):
+    """Пересчитывает похожие рецепты после создания или правки."""
+    # Импорт здесь: модуль задач грузится при старте любого процесса.
+    from recipes.similarity import update_recipe_similarity
+    update_recipe_similarity(recipe_id)
+
+
+@task()
+def update_similar_recipes_batch(recipe_ids):
+    """Пересчитывает похожие рецепты для пачки загруженных рецептов."""
+    from recipes.similarity import update_recipe_similarity
+    for recipe_id in recipe_ids:
+        update_recipe_similarity(recipe_id)
+
+
+@task()
+def repair_favorite_counts(recipe_ids):
+    """Исправляет счётчики избранного рецептов после удалений в обход API."""
+    # Импорт здесь: rankings тянет модели, а задачи грузятся при старте.
+    from recipes.rankings import recount_favorites
+    recount_favorites(recipe_ids)
+
+
+@task()
+def purge_deleted_recipe(recipe_id):
+    """Стирает удалённый рецепт и всё, что от него зависит."""
+    # Импорт здесь: модуль purge сам импортирует задачи.
+    from recipes.purge import purge_recipe
+    purge_recipe(recipe_id)
+
+
+@task()
+def purge_deleted_user(user_id):
+    """Стирает удалённого пользователя, его рецепты и связи."""
+    from recipes.purge import purge_user
+    purge_user(user_id)
@@ -1,10 +1,22 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+
+from foodgram.paginator import EstimatedCountPaginator
+from recipes.purge import soft_delete_user
 from users.models import User
 
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ('pk', 'username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
-    search_fields = ('username', 'emaail')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('username', 'email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+DELETED_PLACEHOLDER = 'deleted:{}'
+
+
+def release_credentials(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    deleted = User._base_manager.filter(deleted_at__isnull=False)
+    for pk in deleted.values_list('pk', flat=True).iterator():
+        placeholder = DELETED_PLACEHOLDER.format(pk)
+        User._base_manager.filter(pk=pk).update(
+            username=placeholder, email=placeholder)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_avatar_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_credentials, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+# Логин и почта удалённого пользователя: освобождают прежние значения
+# для новой регистрации. Двоеточие не пропускают ни валидатор имени,
+# ни проверка адреса почты, поэтому заглушка ни с кем не совпадёт.
+DELETED_PLACEHOLDER = 'deleted:{}'
+
+
+class ActiveUserManager(UserManager):
+    """Пользователи без отметки об удалении."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class User(AbstractUser):
     """Кастомная модель пользователя для проекта Foodgram."""
@@ -39,8 +51,19 @@ class User(AbstractUser):
         upload_to='avatars/',
         verbose_name='Аватар',
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата удаления',
+        help_text='Удалённый пользователь скрыт и будет стёрт в фоне.'
+    )
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
 
     class Meta:
         ordering = ('username',)